@@ -1,13 +1,23 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, has_request_context, g, abort
 import json
 import os
+import sys
 import random
 import time
 from datetime import datetime
 import math
 import threading
 import hashlib
+import uuid
+import bisect
+import itertools
+import sqlite3
+import atexit
+from collections import OrderedDict
 from functools import wraps
+from contextlib import contextmanager
+import numpy as np
+from sortedcontainers import SortedList
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')  # Change this in production
@@ -25,6 +35,27 @@ def admin_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+# Player transaction decorator for routes that modify the player's game data
+# (see run_player_transaction)
+def player_transaction(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            return run_player_transaction(current_player_id(), f, *args, **kwargs)
+        except StateConflict:
+            return jsonify({'success': False, 'message': 'The game is busy, please try again!'})
+    return decorated_function
+
+def player_read(f):
+    # Routes that only show the player's state hold the player's lock too: the
+    # state is the cached dict that transactions change in place, and it has
+    # to stay put until the response is rendered
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with player_lock(current_player_id()):
+            return f(*args, **kwargs)
+    return decorated_function
+
 # Admin login route
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
@@ -49,6 +80,7 @@ def admin_logout():
 # Admin dashboard route
 @app.route('/admin')
 @admin_required
+@player_read
 def admin_dashboard():
     game_data = load_game_data()
     return render_template('admin/dashboard.html', game_data=game_data)
@@ -56,17 +88,20 @@ def admin_dashboard():
 # Admin action routes
 @app.route('/admin/add_coins', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_add_coins():
     game_data = load_game_data()
     amount = int(request.form.get('amount', 0))
     if amount > 0:
         game_data['coins'] += amount
+        metrics.inc('coins_minted_total', amount, source='admin')
         save_game_data(game_data)
         return redirect(url_for('admin_dashboard', success=f'Added {amount} coins'))
     return redirect(url_for('admin_dashboard', error='Invalid amount'))
 
 @app.route('/admin/reset_stats', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_reset_stats():
     game_data = load_game_data()
     game_data['total_rolls'] = 0
@@ -77,6 +112,7 @@ def admin_reset_stats():
 
 @app.route('/admin/reset_inventory', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_reset_inventory():
     game_data = load_game_data()
     game_data['inventory'] = {}
@@ -85,16 +121,22 @@ def admin_reset_inventory():
 
 @app.route('/admin/reset_prestige', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_reset_prestige():
     game_data = load_game_data()
     game_data['prestige_level'] = 0
     game_data['prestige_multiplier'] = 1.0
+    invalidate_luck(game_data)
     save_game_data(game_data)
     return redirect(url_for('admin_dashboard', success='Prestige reset successfully'))
 
 @app.route('/admin/reset_all', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_reset_all():
+    # Everything goes except the position in the player's random stream, so
+    # the reset player doesn't replay draws they have already seen
+    rng_sequence = load_game_data().get('rng_sequence', 0)
     game_data = {
         'coins': 0,
         'total_rolls': 0,
@@ -108,13 +150,16 @@ def admin_reset_all():
         'number_limit': 1000000,
         'achievements': [],
         'daily_rewards': [],
-        'last_daily_reward': None
+        'last_daily_reward': None,
+        'rng_sequence': rng_sequence
     }
+    invalidate_luck(game_data)
     save_game_data(game_data)
     return redirect(url_for('admin_dashboard', success='Game data reset successfully'))
 
 @app.route('/admin/give_item', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_give_item():
     game_data = load_game_data()
     item_name = request.form.get('item_name')
@@ -136,15 +181,16 @@ def admin_give_item():
 
 @app.route('/admin/give_aura', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_give_aura():
     game_data = load_game_data()
     aura_name = request.form.get('aura_name')
     
-    if not aura_name:
+    if aura_name not in auras:
         return redirect(url_for('admin_dashboard', error='Invalid aura name'))
     
-    if aura_name not in game_data['active_auras']:
-        game_data['active_auras'].append(aura_name)
+    if aura_name not in [aura['id'] for aura in game_data['active_auras']]:
+        activate_aura(game_data, aura_name)
         save_game_data(game_data)
         return redirect(url_for('admin_dashboard', success=f'Added {aura_name}'))
     
@@ -152,6 +198,7 @@ def admin_give_aura():
 
 @app.route('/admin/give_pass', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_give_pass():
     game_data = load_game_data()
     pass_name = request.form.get('pass_name')
@@ -161,6 +208,7 @@ def admin_give_pass():
     
     if pass_name not in game_data['game_passes']:
         game_data['game_passes'].append(pass_name)
+        invalidate_luck(game_data)
         save_game_data(game_data)
         return redirect(url_for('admin_dashboard', success=f'Added {pass_name}'))
     
@@ -168,6 +216,7 @@ def admin_give_pass():
 
 @app.route('/admin/set_prestige_level', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_set_prestige_level():
     game_data = load_game_data()
     level = int(request.form.get('level', 0))
@@ -177,11 +226,13 @@ def admin_set_prestige_level():
     
     game_data['prestige_level'] = level
     game_data['prestige_multiplier'] = 1.0 + (level * 0.1)
+    invalidate_luck(game_data)
     save_game_data(game_data)
     return redirect(url_for('admin_dashboard', success=f'Set prestige level to {level}'))
 
 @app.route('/admin/set_number_limit', methods=['POST'])
 @admin_required
+@player_transaction
 def admin_set_number_limit():
     game_data = load_game_data()
     limit = int(request.form.get('limit', 1000000))
@@ -190,12 +241,75 @@ def admin_set_number_limit():
         return redirect(url_for('admin_dashboard', error='Invalid number limit'))
     
     game_data['number_limit'] = limit
+    invalidate_luck(game_data)
     save_game_data(game_data)
     return redirect(url_for('admin_dashboard', success=f'Set number limit to {limit}'))
 
-# Game data file path
+@app.route('/admin/metrics')
+@admin_required
+def admin_metrics():
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/admin/profile')
+@admin_required
+def admin_profile():
+    seconds = request.args.get('seconds', 5, type=float)
+    interval = request.args.get('interval_ms', PROFILE_INTERVAL * 1000, type=float) / 1000
+    if seconds is None or not 0 < seconds <= PROFILE_MAX_SECONDS or interval is None or not interval >= PROFILE_MIN_INTERVAL:
+        return jsonify({
+            'success': False,
+            'message': f'Profile for up to {PROFILE_MAX_SECONDS} seconds, at an interval of at least {PROFILE_MIN_INTERVAL * 1000:g} ms.'
+        }), 400
+    
+    result = profiler.run(seconds, interval)
+    if result is None:
+        return jsonify({'success': False, 'message': 'A profile is already running.'})
+    samples, stacks = result
+    
+    if request.args.get('format') == 'collapsed':
+        return collapse_stacks(stacks) + '\n', 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return jsonify({
+        'success': True,
+        'seconds': seconds,
+        'samples': samples,
+        'top': top_functions(stacks, samples) if samples else [],
+        'collapsed': collapse_stacks(stacks)
+    })
+
+# Game data file path (legacy single-file save, imported into the state store on first run)
 GAME_DATA_FILE = 'game_data.json'
 
+# Player state storage: 'sqlite' or 'journal'
+STATE_BACKEND = os.environ.get('STATE_BACKEND', 'sqlite')
+STATE_DB_FILE = os.environ.get('STATE_DB_FILE', 'game_state.db')
+STATE_JOURNAL_DIR = os.environ.get('STATE_JOURNAL_DIR', 'game_journal')
+STATE_JOURNAL_MAX_BYTES = int(os.environ.get('STATE_JOURNAL_MAX_BYTES', 16 * 1024 * 1024))  # compact past this size
+STATE_COMPACT_INTERVAL = float(os.environ.get('STATE_COMPACT_INTERVAL', 30.0))
+JOURNAL_RETRY_DELAY = 0.1  # seconds the committer waits after a failed write, doubling up to the max
+JOURNAL_MAX_RETRY_DELAY = 5.0
+DEFAULT_PLAYER_ID = 'default'  # the player of the old single-player save
+MARKET_STATE_ID = '_market'  # the global market's record in the state store
+RESERVED_ID_PREFIX = '_'  # state store ids that aren't players start with this
+
+# SQLite state can be sharded across this many database files (the first is
+# STATE_DB_FILE, the others are numbered next to it); players are placed on
+# shards by consistent hashing with this many virtual nodes per shard
+STATE_SHARDS = int(os.environ.get('STATE_SHARDS', 1))
+STATE_SHARD_VNODES = 64
+
+# In-memory state cache: approximate budget (serialized bytes) and write-back
+# interval in seconds; an interval of 0 writes every save through immediately
+# (the default for the journal, which is already cheap to append to)
+STATE_CACHE_MAX_BYTES = int(os.environ.get('STATE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+STATE_FLUSH_INTERVAL = float(os.environ.get('STATE_FLUSH_INTERVAL', 0 if STATE_BACKEND == 'journal' else 2.0))
+
+# Several gunicorn workers on one state store? Then the cache writes through
+# and every save is a compare-and-swap on the player's version, retried up to
+# STATE_MAX_RETRIES times if another worker saved the player first
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+STATE_SHARED = os.environ.get('STATE_SHARED', '1' if WEB_CONCURRENCY > 1 else '0') == '1'
+STATE_MAX_RETRIES = 10
+
 # Shop items (real money purchases)
 shop_items = {
     'starter_pack': {'name': 'Starter Pack', 'coins': 1000, 'real_price': '4.99'},
@@ -269,67 +383,97 @@ auras = {
     }
 }
 
+# Aura durations in seconds, parsed once from the display strings
+duration_units = {'min': 60, 'mins': 60, 'hour': 3600, 'hours': 3600}
+
+def parse_duration(duration):
+    amount, unit = duration.split()
+    return int(float(amount) * duration_units[unit])
+
+for aura in auras.values():
+    aura['duration_seconds'] = parse_duration(aura['duration'])
+
 # Define achievements
 achievements = {
     'rolls_100': {
         'name': 'Rolling Beginner',
         'description': 'Roll 100 times',
         'reward': 1000000,
-        'icon': '🎲'
+        'icon': '🎲',
+        'stat': 'total_rolls',
+        'threshold': 100
     },
     'rolls_1000': {
         'name': 'Rolling Enthusiast',
         'description': 'Roll 1,000 times',
         'reward': 5000000,
-        'icon': '🎲'
+        'icon': '🎲',
+        'stat': 'total_rolls',
+        'threshold': 1000
     },
     'rolls_10000': {
         'name': 'Rolling Master',
         'description': 'Roll 10,000 times',
         'reward': 20000000,
-        'icon': '🎲'
+        'icon': '🎲',
+        'stat': 'total_rolls',
+        'threshold': 10000
     },
     'best_1000': {
         'name': 'Lucky One',
         'description': 'Get a roll of 1/1,000 or better',
         'reward': 5000000,
-        'icon': '🍀'
+        'icon': '🍀',
+        'stat': 'best_number',
+        'threshold': 1000
     },
     'best_10000': {
         'name': 'Super Lucky',
         'description': 'Get a roll of 1/10,000 or better',
         'reward': 15000000,
-        'icon': '🍀'
+        'icon': '🍀',
+        'stat': 'best_number',
+        'threshold': 10000
     },
     'best_100000': {
         'name': 'Extremely Lucky',
         'description': 'Get a roll of 1/100,000 or better',
         'reward': 50000000,
-        'icon': '🍀'
+        'icon': '🍀',
+        'stat': 'best_number',
+        'threshold': 100000
     },
     'best_1000000': {
         'name': 'Legendary Luck',
         'description': 'Get a roll of 1/1,000,000 or better',
         'reward': 200000000,
-        'icon': '🍀'
+        'icon': '🍀',
+        'stat': 'best_number',
+        'threshold': 1000000
     },
     'coins_10000': {
         'name': 'Small Fortune',
         'description': 'Accumulate 10,000 coins',
         'reward': 5000000,
-        'icon': '💰'
+        'icon': '💰',
+        'stat': 'coins',
+        'threshold': 10000
     },
     'coins_100000': {
         'name': 'Medium Fortune',
         'description': 'Accumulate 100,000 coins',
         'reward': 20000000,
-        'icon': '💰'
+        'icon': '💰',
+        'stat': 'coins',
+        'threshold': 100000
     },
     'coins_1000000': {
         'name': 'Large Fortune',
         'description': 'Accumulate 1,000,000 coins',
         'reward': 100000000,
-        'icon': '💰'
+        'icon': '💰',
+        'stat': 'coins',
+        'threshold': 1000000
     },
     'all_auras': {
         'name': 'Aura Collector',
@@ -345,6 +489,70 @@ achievements = {
     }
 }
 
+# Achievement index, built once from the achievements above. Each achievement
+# gets a bit in the player's unlocked mask; threshold achievements are sorted
+# per stat so a player only needs "next unlock at" per stat. Saved masks are
+# tagged with the index they were built under, and rebuilt from the unlocked
+# list once the achievements are added to, reordered or rebalanced.
+achievement_bits = {achievement_id: 1 << i for i, achievement_id in enumerate(achievements)}
+achievement_index_id = hashlib.blake2b(json.dumps([
+    (achievement_id, achievement.get('stat'), achievement.get('threshold'))
+    for achievement_id, achievement in achievements.items()
+]).encode(), digest_size=8).hexdigest()
+achievement_thresholds = {}  # stat -> [(threshold, achievement_id), ...] ascending
+for achievement_id, achievement in achievements.items():
+    if 'stat' in achievement:
+        achievement_thresholds.setdefault(achievement['stat'], []).append((achievement['threshold'], achievement_id))
+for thresholds in achievement_thresholds.values():
+    thresholds.sort()
+
+# Achievements that aren't a stat threshold
+achievement_checks = {
+    'all_auras': lambda game_data: set(auras) <= set(game_data.get('auras_collected', [])),
+    'all_passes': lambda game_data: all(game_data['game_passes'].values())
+}
+
+def achievement_stat(game_data, stat):
+    if stat == 'coins':
+        return game_data['coins']
+    return game_data['stats'][stat]
+
+def next_achievement_thresholds(mask):
+    next_thresholds = {}
+    for stat, thresholds in achievement_thresholds.items():
+        next_thresholds[stat] = next(
+            (threshold for threshold, achievement_id in thresholds if not mask & achievement_bits[achievement_id]),
+            None
+        )
+    return next_thresholds
+
+def achievement_progress(game_data):
+    progress = game_data.get('achievements')
+    if not isinstance(progress, dict) or progress.get('index') != achievement_index_id:
+        progress = sync_achievement_progress(game_data)
+    return progress
+
+def sync_achievement_progress(game_data):
+    # Build the mask and next thresholds from the unlocked list (older saves,
+    # and states rebuilt by resets, only have the list; saves from before a
+    # change to the achievements have a mask built under the old index)
+    progress = game_data.get('achievements')
+    if not isinstance(progress, dict):
+        progress = {}
+    unlocked = [achievement_id for achievement_id in progress.get('unlocked', []) if achievement_id in achievement_bits]
+    mask = 0
+    for achievement_id in unlocked:
+        mask |= achievement_bits[achievement_id]
+    
+    progress = {
+        'unlocked': unlocked,
+        'index': achievement_index_id,
+        'mask': mask,
+        'next': next_achievement_thresholds(mask)
+    }
+    game_data['achievements'] = progress
+    return progress
+
 # Define daily rewards
 daily_rewards = [
     {'day': 1, 'coins': 100000, 'name': 'Day 1', 'icon': '🎁'},
@@ -381,167 +589,1360 @@ prestige_upgrades = {
     }
 }
 
+# Simulated players: how many, seconds per simulation tick, and the average
+# seconds between a bot's actions
+BOT_COUNT = int(os.environ.get('BOT_COUNT', 15))
+BOT_TICK = float(os.environ.get('BOT_TICK', 5.0))
+BOT_ACTION_INTERVAL = 75.0
+
+# Leaderboard entries per page
+LEADERBOARD_PAGE_SIZE = 50
+
+# Shared mode: most seconds a worker's leaderboard lags saves made by others
+LEADERBOARD_SYNC_INTERVAL = float(os.environ.get('LEADERBOARD_SYNC_INTERVAL', 2.0))
+
+# Largest n accepted by /generate_number_batch
+MAX_BATCH_ROLLS = 10000
+
+# Most bets accepted by /gamble_batch, and the highest gamble payout multiplier
+MAX_BATCH_BETS = 1000
+MAX_GAMBLE_PAYOUT = 100
+
+# Most luck_cache entries kept before it is cleared
+LUCK_CACHE_SIZE = 100000
+
+# Most roll distributions (one per number limit) kept before they are cleared
+ROLL_DISTRIBUTION_CACHE_SIZE = 1024
+
+# Batches up to this many rolls are drawn one by one; larger ones are sampled
+# from the roll distribution in constant time
+EXACT_ROLL_BATCH = 4096
+
+# Most item packs /generate opens in one request
+MAX_PACK_OPENS = 10000
+
+# Most pre-serialized /get_market_info bodies kept before the cache is cleared
+MARKET_INFO_CACHE_SIZE = 1024
+
+# Server-side auto generate: seconds between ticks and generates per second
+AUTO_GENERATE_TICK = float(os.environ.get('AUTO_GENERATE_TICK', 5.0))
+AUTO_GENERATE_RATE = float(os.environ.get('AUTO_GENERATE_RATE', 2.0))
+
+# Random number streams: the master seed (random per process unless set; set
+# the same RNG_SEED on every worker to make player streams reproducible
+# anywhere) and the ring buffer sizes, in uniforms per refill
+RNG_SEED = os.environ.get('RNG_SEED') or os.urandom(16).hex()
+RNG_MIN_BLOCK = 16
+RNG_BLOCK_SIZE = 4096
+
+# RNG service. Every draw in the game comes from a NumPy Philox generator.
+# Scalar draws are handed out of a per-thread ring buffer of uniforms that is
+# refilled in bulk, and vectorized draws use the thread's generator directly.
+# Philox is counter based, so a (key, counter) seed pins down a whole stream
+# and repositioning a thread's stream is cheap:
+#  - each thread starts on its own stream, keyed by the master seed, the
+#    worker's pid and the thread
+#  - loading a player switches the thread to that player's stream: keyed by
+#    the master seed and player id, with the player's rng_sequence (bumped on
+#    every load) in the second counter word. Philox only advances the first
+#    word as it draws, so every request gets its own 2**64-block stretch of
+#    the stream that no other request's draws reach. Given the seed, a
+#    request's outcomes replay exactly.
+# The ring buffer is an iterator chained over blocks of uniforms, and its
+# __next__ is the thread's random(): a scalar draw is one lookup and one C
+# call, and a block is only drawn once the request asks for its first scalar.
+class RandomStream(threading.local):
+    def __init__(self):
+        self.bit_generator = np.random.Philox()
+        self.generator = np.random.Generator(self.bit_generator)
+        # Reseeding rewrites these arrays in place instead of building new ones
+        self.counter = np.zeros(4, dtype=np.uint64)
+        self.key = np.zeros(2, dtype=np.uint64)
+        self.state = {
+            'bit_generator': 'Philox',
+            'state': {'counter': self.counter, 'key': self.key},
+            'buffer': np.zeros(4, dtype=np.uint64),
+            'buffer_pos': 4,
+            'has_uint32': 0,
+            'uinteger': 0
+        }
+        self.reseed(derive_rng_key(f'worker:{os.getpid()}:{threading.get_ident()}'), 0)
+
+    def reseed(self, key, sequence):
+        self.counter[:] = (0, sequence, 0, 0)
+        self.key[:] = key
+        self.bit_generator.state = self.state
+        self.seed = (key, sequence)
+        blocks = map(np.ndarray.tolist, map(self.generator.random, rng_block_sizes()))
+        self.random = itertools.chain.from_iterable(blocks).__next__
+
+    def uniform(self, low, high):
+        return low + (high - low) * self.random()
+
+    def randrange(self, count):
+        return int(self.random() * count)
+
+def rng_block_sizes():
+    # Requests draw only a few numbers, so start with small refills
+    block_size = RNG_MIN_BLOCK
+    while block_size < RNG_BLOCK_SIZE:
+        yield block_size
+        block_size *= 2
+    yield from itertools.repeat(RNG_BLOCK_SIZE)
+
+def derive_rng_key(name):
+    # Two 64-bit Philox key words from the master seed and a stream name
+    digest = hashlib.blake2b(f'{RNG_SEED}:{name}'.encode(), digest_size=16).digest()
+    return (int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little'))
+
+def format_rng_seed(seed):
+    key, sequence = seed
+    return f'{key[0]:016x}{key[1]:016x}:{sequence}'
+
+def parse_rng_seed(text):
+    key, sequence = text.split(':')
+    return (int(key[:16], 16), int(key[16:], 16)), int(sequence)
+
+def seed_player_rng(player_id, game_data):
+    # Put this thread on the player's stream for the request (or on the
+    # recorded stream, when replay.py plays a request back)
+    sequence = game_data.get('rng_sequence', 0)
+    game_data['rng_sequence'] = sequence + 1
+    key = derive_rng_key(f'player:{player_id}')
+    if has_request_context():
+        if 'game.rng_seed' in request.environ:
+            key, sequence = parse_rng_seed(request.environ['game.rng_seed'])
+        g.rng_seed = (key, sequence)
+    rng.reseed(key, sequence)
+
+rng = RandomStream()
+
+# Histogram bucket upper bounds: seconds for latencies, bytes for state sizes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Metrics: counters and histograms, exported in the Prometheus text format.
+# Every thread records into its own shard, so recording takes no lock; the
+# shards are only summed up when /admin/metrics is scraped. Shards of threads
+# that have finished are folded into one retired shard, so servers that start
+# a thread per request don't pile them up.
+class Metrics:
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = []  # (thread, shard) for every thread that recorded something
+        self.retired = new_metrics_shard()
+        self.lock = threading.Lock()
+        self.help = {}
+        self.buckets = {}
+
+    def counter(self, name, help_text):
+        self.help[name] = ('counter', help_text)
+
+    def histogram(self, name, help_text, buckets):
+        self.help[name] = ('histogram', help_text)
+        self.buckets[name] = buckets
+
+    def shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = self.local.shard = new_metrics_shard()
+            with self.lock:
+                self.retire()
+                self.shards.append((threading.current_thread(), shard))
+        return shard
+
+    def retire(self):
+        # Fold the shards of finished threads into the retired shard (with the
+        # lock held); nothing writes to them any more
+        live = []
+        for thread, shard in self.shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                merge_metrics_shard(self.retired, shard)
+        self.shards = live
+
+    @contextmanager
+    def deferred(self):
+        # Records made in the block go to a scratch shard and only count if
+        # the block finishes; one that raises (a transaction attempt that lost
+        # a compare-and-swap and is retried) leaves no trace
+        outer = self.shard()
+        self.local.shard = new_metrics_shard()
+        try:
+            yield
+            merge_metrics_shard(outer, self.local.shard)
+        finally:
+            self.local.shard = outer
+
+    def inc(self, name, amount=1, **labels):
+        try:
+            counters = self.local.shard['counters']
+        except AttributeError:
+            counters = self.shard()['counters']
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        try:
+            histograms = self.local.shard['histograms']
+        except AttributeError:
+            histograms = self.shard()['histograms']
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        histogram = histograms.get(key)
+        if histogram is None:
+            # Bucket counts (the last one is +Inf), then sum
+            histogram = histograms[key] = [0] * (len(self.buckets[name]) + 2)
+        histogram[bisect.bisect_left(self.buckets[name], value)] += 1
+        histogram[-1] += value
+
+    def collect(self):
+        # Sum the shards; a shard may be updated while we read it, which only
+        # means an observation lands in this scrape or the next one
+        total = new_metrics_shard()
+        with self.lock:
+            self.retire()
+            merge_metrics_shard(total, self.retired)
+            shards = [shard for thread, shard in self.shards]
+        for shard in shards:
+            merge_metrics_shard(total, shard)
+        return total['counters'], total['histograms']
+
+    def render(self):
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text) in self.help.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+                continue
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets[name] + ('+Inf',), histogram):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {histogram[-1]}')
+                lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+def new_metrics_shard():
+    return {'counters': {}, 'histograms': {}}
+
+def merge_metrics_shard(total, shard):
+    for key, value in list(shard['counters'].items()):
+        total['counters'][key] = total['counters'].get(key, 0) + value
+    for key, histogram in list(shard['histograms'].items()):
+        totals = total['histograms'].setdefault(key, [0] * len(histogram))
+        for i, value in enumerate(list(histogram)):
+            totals[i] += value
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an ascending list, for the latency reports of
+    # loadgen.py and replay.py
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+metrics = Metrics()
+metrics.counter('http_requests_total', 'Requests handled, by endpoint and status code.')
+metrics.counter('http_request_errors_total', 'Requests answered with a 4xx or 5xx status, by endpoint.')
+metrics.histogram('http_request_duration_seconds', 'Request latency, by endpoint.', LATENCY_BUCKETS)
+metrics.histogram('state_load_duration_seconds', 'Time to load a player\'s state.', LATENCY_BUCKETS)
+metrics.histogram('state_load_bytes', 'Serialized size of loaded player states.', SIZE_BUCKETS)
+metrics.histogram('state_save_duration_seconds', 'Time to save a player\'s state.', LATENCY_BUCKETS)
+metrics.histogram('state_save_bytes', 'Serialized size of saved player states.', SIZE_BUCKETS)
+metrics.counter('state_save_errors_total', 'Saves that failed.')
+metrics.counter('state_conflicts_total', 'Saves that lost a compare-and-swap race and were retried.')
+metrics.counter('rolls_total', 'Numbers rolled, by source.')
+metrics.counter('coins_minted_total', 'Coins added to player balances, by source.')
+metrics.counter('items_generated_total', 'Items pulled from packs, by rarity.')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    endpoint = request.endpoint or 'unknown'
+    if started is not None:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+    metrics.inc('http_requests_total', endpoint=endpoint, status=str(response.status_code))
+    if response.status_code >= 400:
+        metrics.inc('http_request_errors_total', endpoint=endpoint)
+    return response
+
+# Longest profile /admin/profile will run, and its default and shortest sampling intervals
+PROFILE_MAX_SECONDS = 60
+PROFILE_INTERVAL = 0.005
+PROFILE_MIN_INTERVAL = 0.001
+
+# Sampling profiler: while a profile runs, a sampler thread snapshots every
+# other thread's stack with sys._current_frames() at a fixed interval and
+# counts identical stacks. Nothing is hooked into the interpreter, so when no
+# profile is running it costs nothing at all.
+class SamplingProfiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def run(self, seconds, interval):
+        # Returns (samples, {stack tuple: count}), or None if a profile is already running
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            stacks = {}
+            skip = {threading.get_ident()}
+            sampler = threading.Thread(target=self.sample, args=(seconds, interval, stacks, skip))
+            sampler.daemon = True
+            sampler.start()
+            sampler.join()
+            return sum(stacks.values()), stacks
+        finally:
+            self.lock.release()
+
+    def sample(self, seconds, interval, stacks, skip):
+        skip.add(threading.get_ident())
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in skip:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                stack = tuple(reversed(stack))
+                stacks[stack] = stacks.get(stack, 0) + 1
+            time.sleep(interval)
+
+def collapse_stacks(stacks):
+    # One 'root;caller;callee count' line per stack, as flame graph tools read them
+    return '\n'.join(f"{';'.join(stack)} {count}" for stack, count in sorted(stacks.items()))
+
+def top_functions(stacks, samples, limit=30):
+    # Functions by samples spent in the function itself and in anything it called
+    self_counts = {}
+    total_counts = {}
+    for stack, count in stacks.items():
+        frames = stack[1:]
+        if frames:
+            self_counts[frames[-1]] = self_counts.get(frames[-1], 0) + count
+        for function in set(frames):
+            total_counts[function] = total_counts.get(function, 0) + count
+    ranked = sorted(total_counts, key=lambda function: (-self_counts.get(function, 0), -total_counts[function]))
+    return [{
+        'function': function,
+        'self': self_counts.get(function, 0),
+        'total': total_counts[function],
+        'self_percent': 100 * self_counts.get(function, 0) / samples,
+        'total_percent': 100 * total_counts[function] / samples
+    } for function in ranked[:limit]]
+
+profiler = SamplingProfiler()
+
+# Game clock: game rules read the time through game_time(). A request sees
+# one fixed time, stamped when it starts (or given by replay.py, which plays
+# recorded requests back at their recorded times).
+def game_time():
+    if has_request_context():
+        return request.environ.get('game.time') or time.time()
+    return time.time()
+
+@app.before_request
+def stamp_request_time():
+    request.environ.setdefault('game.time', time.time())
+
+# Session recorder (opt-in): with SESSION_LOG_FILE set, every request is
+# appended to that file as one JSON line with its route, arguments, time, the
+# RNG seed it used, and digests of its response and of the player's saved
+# state, so replay.py can play the traffic back and diff the outcomes.
+SESSION_LOG_FILE = os.environ.get('SESSION_LOG_FILE')
+
+# Endpoints left out of session logs, and request fields whose values are
+# replaced with REDACTED (replay.py sends the placeholder instead)
+UNRECORDED_ENDPOINTS = {'static', 'admin_login', 'admin_metrics', 'admin_profile'}
+REDACTED_FIELDS = {'password', 'token'}
+REDACTED = '[redacted]'
+
+class SessionRecorder:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8') if path else None
+
+    def record(self, response):
+        entry = {
+            'time': request.environ['game.time'],
+            'method': request.method,
+            'path': request.full_path if request.query_string else request.path,
+            'player': current_player_id(),
+            'status': response.status_code,
+            'response': digest(sent_body(response))
+        }
+        if request.form:
+            entry['form'] = redact(request.form.to_dict())
+        body = request.get_json(silent=True)
+        if body is not None:
+            entry['json'] = redact(body) if isinstance(body, dict) else body
+        if request.if_none_match:
+            entry['if_none_match'] = request.headers['If-None-Match']
+        if session.get('admin_logged_in'):
+            entry['admin'] = True
+        if 'rng_seed' in g:
+            entry['seed'] = format_rng_seed(g.rng_seed)
+        if 'state_digest' in g:
+            entry['state'] = g.state_digest
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+def redact(fields):
+    return {name: REDACTED if name in REDACTED_FIELDS else value for name, value in fields.items()}
+
+def sent_body(response):
+    # The bytes the client gets: the server drops the body of a HEAD request
+    # and of bodyless statuses, like the 304 of a conditional GET
+    if request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 304):
+        return b''
+    return response.get_data()
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+def state_digest(game_data):
+    # The luck cache token is random and says nothing about the game
+    return digest(serialize_state({key: value for key, value in game_data.items() if key != 'luck_epoch'}).encode())
+
+session_recorder = SessionRecorder(SESSION_LOG_FILE)
+
+@app.after_request
+def record_session(response):
+    if session_recorder.file is not None and request.endpoint not in UNRECORDED_ENDPOINTS:
+        session_recorder.record(response)
+    return response
+
+# Leaderboard index: one sorted ranking per key, kept up to date as players
+# save and bots act, so pages and ranks are O(log n) instead of a full sort
+# per view. Each worker indexes the saves it sees plus the saved players it
+# finds at startup. In shared mode the other workers' saves are picked up by
+# sync(), which re-reads the players whose store version moved since this
+# worker last indexed them; reads call it at most every
+# LEADERBOARD_SYNC_INTERVAL seconds.
+class LeaderboardIndex:
+    keys = ('coins', 'best_number', 'total_rolls')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # entry_id -> {'name', 'coins', 'best_number', 'total_rolls'}
+        self.rankings = {key: SortedList() for key in self.keys}  # (-score, entry_id)
+        self.versions = {}  # player_id -> store version indexed, for saved players
+        self.sync_lock = threading.Lock()
+        self.synced_at = 0.0
+
+    def update(self, entry_id, name, coins, best_number, total_rolls):
+        entry = {'name': name, 'coins': coins, 'best_number': best_number, 'total_rolls': total_rolls}
+        with self.lock:
+            old = self.entries.get(entry_id)
+            for key in self.keys:
+                if old is not None and old[key] == entry[key]:
+                    continue
+                if old is not None:
+                    self.rankings[key].remove((-old[key], entry_id))
+                self.rankings[key].add((-entry[key], entry_id))
+            self.entries[entry_id] = entry
+
+    def update_player(self, player_id, game_data, version=None):
+        self.update(
+            player_id,
+            game_data.get('name') or f'Player {player_id[:6]}',
+            game_data['coins'],
+            game_data['stats']['best_number'],
+            game_data['stats']['total_rolls']
+        )
+        if version:
+            self.versions[player_id] = version
+
+    def remove(self, entry_id):
+        with self.lock:
+            old = self.entries.pop(entry_id, None)
+            if old is not None:
+                for key in self.keys:
+                    self.rankings[key].remove((-old[key], entry_id))
+        self.versions.pop(entry_id, None)
+
+    def sync(self, store):
+        # Straight from the store, so the scan doesn't fill the state cache
+        versions = dict(store.versions())
+        for player_id, version in versions.items():
+            if player_id.startswith(RESERVED_ID_PREFIX) or self.versions.get(player_id) == version:
+                continue
+            game_data = store.get(player_id)
+            if game_data is not None:
+                self.update_player(player_id, game_data, version)
+        for player_id in [player_id for player_id in self.versions if player_id not in versions]:
+            self.remove(player_id)
+
+    def maybe_sync(self, store):
+        # One thread syncs while the others serve the index as it is
+        if time.time() - self.synced_at < LEADERBOARD_SYNC_INTERVAL or not self.sync_lock.acquire(blocking=False):
+            return
+        try:
+            self.sync(store)
+            self.synced_at = time.time()
+        finally:
+            self.sync_lock.release()
+
+    def page(self, key, offset, limit):
+        with self.lock:
+            ranking = self.rankings[key]
+            page = []
+            for score, entry_id in ranking.islice(offset, offset + limit):
+                # Tied players share a rank
+                rank = ranking.bisect_left((score,)) + 1
+                page.append(dict(self.entries[entry_id], id=entry_id, rank=rank))
+            return page
+
+    def rank(self, key, entry_id):
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                return None
+            return self.rankings[key].bisect_left((-entry[key],)) + 1
+
+    def __len__(self):
+        return len(self.entries)
+
+leaderboard_index = LeaderboardIndex()
+
 # Add this after the other global variables
-bots = []
 bot_names = [
     "LuckyBot", "NumberNinja", "RollMaster", "CoinCollector", "GambleGuru",
     "LuckyLarry", "RollingRandy", "NumberNerd", "CoinKing", "GambleGirl",
     "LuckyLucy", "RollingRob", "NumberNick", "CoinCarla", "GambleGary"
 ]
 
-# Bot class to simulate players
-class Bot:
-    def __init__(self, name):
-        self.name = name
-        self.coins = random.randint(10000, 100000)
-        self.best_number = 0
-        self.total_rolls = 0
-        self.last_active = time.time()
-        self.active = True
-    
-    def generate_number(self):
-        # Simulate number generation
-        base_number = int(random.uniform(1, 1000000 ** 0.7) ** (1/0.7))
-        self.best_number = max(self.best_number, base_number)
-        self.total_rolls += 1
-        self.coins += 200  # Fixed coin earnings (increased from 20)
-        self.last_active = time.time()
-        return base_number
-    
-    def gamble(self):
-        # Simulate gambling
-        if self.coins < 1000:
-            return
-        
-        bet_amount = random.randint(1000, min(10000, self.coins))
-        min_val = random.randint(1, 100000)
-        max_val = min_val + random.randint(100, 10000)
-        
-        # Generate a number
-        base_number = int(random.uniform(1, 1000000 ** 0.7) ** (1/0.7))
-        
-        # Check if bot won
-        won = min_val <= base_number <= max_val
+# What a bot can do on its turn, picked with equal chance
+BOT_ACTIVITIES = ('generate', 'gamble', 'buy_item')
+
+def make_bot_names(count):
+    # The named bots first, then numbered variants of them
+    return [
+        bot_names[i % len(bot_names)] + (str(i // len(bot_names)) if i >= len(bot_names) else '')
+        for i in range(count)
+    ]
+
+# Bot population to simulate players, stored as one array per attribute and
+# advanced in fixed ticks. Each tick picks the bots that act (each bot acts on
+# average every BOT_ACTION_INTERVAL seconds, like a human taking 30 seconds to
+# 2 minutes between actions) and applies each activity to all of its bots at
+# once, so the cost per tick barely depends on how many bots there are.
+class BotPopulation:
+    def __init__(self, names):
+        count = len(names)
+        self.names = names
+        self.coins = rng.generator.integers(10000, 100000, count, endpoint=True)
+        self.best_number = np.zeros(count, dtype=np.int64)
+        self.total_rolls = np.zeros(count, dtype=np.int64)
+        self.last_active = np.full(count, time.time())
+        self.active = np.ones(count, dtype=bool)
+        self.item_prices = np.array([item['base_price'] for item in game_items.values()])
+
+    def tick(self, elapsed):
+        # Returns the indices of the bots that did something
+        count = len(self.names)
+        now = time.time()
+        act_chance = 1 - math.exp(-elapsed / BOT_ACTION_INTERVAL)
+        acting = self.active & (rng.generator.random(count) < act_chance)
+        activity = rng.generator.integers(0, len(BOT_ACTIVITIES), count)
         
-        # Calculate payout
-        range_size = max_val - min_val
-        total_range = 1000000
-        probability = range_size / total_range
-        payout_multiplier = min(1 / probability, 100)
+        generating = np.flatnonzero(acting & (activity == BOT_ACTIVITIES.index('generate')))
+        gambling = np.flatnonzero(acting & (activity == BOT_ACTIVITIES.index('gamble')) & (self.coins >= 1000))
+        buying = np.flatnonzero(acting & (activity == BOT_ACTIVITIES.index('buy_item')) & (self.coins >= 10000))
         
-        # Update coins
-        if won:
-            winnings = int(bet_amount * payout_multiplier)
-            self.coins += winnings - bet_amount
-        else:
-            self.coins -= bet_amount
+        # Generate: one roll each with fixed coin earnings
+        rolls = roll_distribution(1000000).sample_many(len(generating))
+        self.best_number[generating] = np.maximum(self.best_number[generating], rolls)
+        self.total_rolls[generating] += 1
+        self.coins[generating] += 200
         
-        self.last_active = time.time()
-    
-    def buy_item(self):
-        # Simulate buying items
-        if self.coins < 10000:
-            return
+        # Gamble: random bet on a random range
+        bets = rng.generator.integers(1000, np.minimum(10000, self.coins[gambling]), endpoint=True)
+        min_vals = rng.generator.integers(1, 100000, len(gambling), endpoint=True)
+        max_vals = min_vals + rng.generator.integers(100, 10000, len(gambling), endpoint=True)
+        numbers = roll_distribution(1000000).sample_many(len(gambling))
+        won = (min_vals <= numbers) & (numbers <= max_vals)
+        payout_multipliers = gamble_odds(1000000, min_vals, max_vals)[1]
+        self.coins[gambling] += np.where(won, (bets * payout_multipliers).astype(np.int64) - bets, -bets)
         
-        # Randomly select an item
-        item_id = random.choice(list(game_items.keys()))
-        item = game_items[item_id]
+        # Buy item: a random item at its base price, if affordable
+        prices = self.item_prices[rng.generator.integers(0, len(self.item_prices), len(buying))]
+        affordable = self.coins[buying] >= prices
+        bought = buying[affordable]
+        self.coins[bought] -= prices[affordable]
         
-        # Check if bot can afford it
-        if self.coins >= item['base_price']:
-            self.coins -= item['base_price']
-            self.last_active = time.time()
+        changed = np.concatenate([generating, gambling, bought])
+        self.last_active[changed] = now
+        return changed
+
+    def leaderboard_entry(self, index):
+        return (
+            self.names[index],
+            self.names[index],
+            int(self.coins[index]),
+            int(self.best_number[index]),
+            int(self.total_rolls[index])
+        )
+
+bot_population = None
 
 # Bot activity thread
 def bot_activity_thread():
-    global bots
+    global bot_population
     
-    # Create initial bots
-    for name in bot_names:
-        bots.append(Bot(name))
+    # Create the bots
+    bot_population = BotPopulation(make_bot_names(BOT_COUNT))
+    for index in range(BOT_COUNT):
+        leaderboard_index.update(*bot_population.leaderboard_entry(index))
     
     while True:
-        # Update bot activities
-        for bot in bots:
-            if not bot.active:
-                continue
-                
-            # Randomly choose an activity
-            activity = random.choice(['generate', 'gamble', 'buy_item'])
+        time.sleep(BOT_TICK)
+        for index in bot_population.tick(BOT_TICK):
+            leaderboard_index.update(*bot_population.leaderboard_entry(index))
+
+# SQLite-backed player state store: one row per player, so saving a player only
+# rewrites that player's row instead of the whole game_data.json document
+class SQLiteStateStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.connect().execute(
+            'CREATE TABLE IF NOT EXISTS players ('
+            'player_id TEXT PRIMARY KEY, '
+            'state TEXT NOT NULL, '
+            'version INTEGER NOT NULL DEFAULT 0, '
+            'updated_at REAL NOT NULL)'
+        )
+
+    def connect(self):
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def get(self, player_id):
+        row = self.connect().execute(
+            'SELECT state FROM players WHERE player_id = ?', (player_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def get_versioned(self, player_id):
+        row = self.connect().execute(
+            'SELECT state, version FROM players WHERE player_id = ?', (player_id,)
+        ).fetchone()
+        if row is None:
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def version(self, player_id):
+        row = self.connect().execute(
+            'SELECT version FROM players WHERE player_id = ?', (player_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def compare_and_set(self, player_id, payload, event, expected_version):
+        # Write only if the row is still at the version the caller read;
+        # version 0 means the player must not exist yet
+        conn = self.connect()
+        if expected_version == 0:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO players (player_id, state, version, updated_at) VALUES (?, ?, 1, ?)',
+                (player_id, payload, time.time())
+            )
+        else:
+            cursor = conn.execute(
+                'UPDATE players SET state = ?, version = version + 1, updated_at = ? '
+                'WHERE player_id = ? AND version = ?',
+                (payload, time.time(), player_id, expected_version)
+            )
+        if cursor.rowcount != 1:
+            raise StateConflict(player_id)
+        return expected_version + 1
+
+    def put(self, player_id, state, event=None):
+        self.put_many([(player_id, serialize_state(state), event)])
+
+    def put_many(self, items):
+        # items are (player_id, serialized state, event) tuples, written in one transaction
+        now = time.time()
+        conn = self.connect()
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany(
+                'INSERT INTO players (player_id, state, version, updated_at) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT(player_id) DO UPDATE SET '
+                'state = excluded.state, version = players.version + 1, updated_at = excluded.updated_at',
+                [(player_id, payload, now) for player_id, payload, event in items]
+            )
+
+    def player_ids(self):
+        rows = self.connect().execute('SELECT player_id FROM players').fetchall()
+        return [row[0] for row in rows]
+
+    def versions(self):
+        # (player_id, version) for every saved player
+        return self.connect().execute('SELECT player_id, version FROM players').fetchall()
+
+    def delete(self, player_id):
+        self.connect().execute('DELETE FROM players WHERE player_id = ?', (player_id,))
+
+# Sharded SQLite store: players are spread over several database files by
+# consistent hashing. Every shard owns STATE_SHARD_VNODES points on a hash
+# ring and a player lives on the shard owning the first point at or after the
+# hash of their id, so adding a shard only moves the players that land on its
+# points (about 1/N of them). Players who moved are copied over at startup,
+# by one worker at a time: the others wait on a lock file next to the first
+# shard and then find nothing left to move.
+class ShardedStateStore:
+    def __init__(self, paths, vnodes):
+        self.shards = [SQLiteStateStore(path) for path in paths]
+        self.lock_path = paths[0] + '.rebalance.lock'
+        # Ring points are named after the shard files, so they stay put when shards are added
+        ring = sorted(
+            (ring_hash(f'{os.path.basename(path)}#{vnode}'), index)
+            for index, path in enumerate(paths)
+            for vnode in range(vnodes)
+        )
+        self.ring_points = [point for point, index in ring]
+        self.ring_shards = [index for point, index in ring]
+        with self.rebalance_lock():
+            self.rebalance()
+
+    def shard_index(self, player_id):
+        i = bisect.bisect_left(self.ring_points, ring_hash(player_id))
+        return self.ring_shards[i % len(self.ring_shards)]
+
+    def shard(self, player_id):
+        return self.shards[self.shard_index(player_id)]
+
+    @contextmanager
+    def rebalance_lock(self):
+        # Sharding is for the multi-worker (gunicorn) setup, so this lock is Unix only
+        import fcntl
+        with open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def rebalance(self):
+        # Move players stored on a shard that no longer owns them. The copy
+        # is written before the old one is deleted, so an interrupted move
+        # leaves a stale duplicate, which the next rebalance just drops.
+        moved = 0
+        for index, store in enumerate(self.shards):
+            for player_id in store.player_ids():
+                owner = self.shard(player_id)
+                if owner is store:
+                    continue
+                if owner.get(player_id) is None:
+                    owner.put(player_id, store.get(player_id), 'rebalance')
+                    moved += 1
+                store.delete(player_id)
+        if moved:
+            print(f"Moved {moved} players to their new state shards")
+
+    def get(self, player_id):
+        return self.shard(player_id).get(player_id)
+
+    def get_versioned(self, player_id):
+        return self.shard(player_id).get_versioned(player_id)
+
+    def version(self, player_id):
+        return self.shard(player_id).version(player_id)
+
+    def compare_and_set(self, player_id, payload, event, expected_version):
+        return self.shard(player_id).compare_and_set(player_id, payload, event, expected_version)
+
+    def put(self, player_id, state, event=None):
+        self.shard(player_id).put(player_id, state, event)
+
+    def put_many(self, items):
+        # One transaction per shard
+        by_shard = {}
+        for item in items:
+            by_shard.setdefault(self.shard_index(item[0]), []).append(item)
+        for index, shard_items in by_shard.items():
+            self.shards[index].put_many(shard_items)
+
+    def player_ids(self):
+        return [player_id for store in self.shards for player_id in store.player_ids()]
+
+    def versions(self):
+        return [row for store in self.shards for row in store.versions()]
+
+    def delete(self, player_id):
+        self.shard(player_id).delete(player_id)
+
+def ring_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+def state_shard_paths(count):
+    root, ext = os.path.splitext(STATE_DB_FILE)
+    return [STATE_DB_FILE] + [f'{root}-{i}{ext}' for i in range(1, count)]
+
+# Append-only journal store. Every save is appended to the active journal
+# segment as one JSON line holding the top-level fields of the player's state
+# that changed ("set") or went away ("unset"), and concurrent saves are
+# group-committed with a single fsync. A background compactor folds the
+# journal into an atomically replaced snapshot of full states; on startup the
+# state is rebuilt from the snapshot plus the journal tail. Single process only.
+#
+# A batch whose write fails fails only the saves in it: the segment is cut
+# back to where the batch started, the players' states go back to what the
+# journal holds (or, if they have saved again since, their next record is
+# written as a full state), and the committer carries on after a backoff.
+class JournalStateStore:
+    def __init__(self, directory, max_journal_bytes, compact_interval):
+        self.directory = directory
+        self.max_journal_bytes = max_journal_bytes
+        self.snapshot_path = os.path.join(directory, 'snapshot.jsonl')
+        self.states = {}  # player_id -> {top-level field: serialized value}
+        self.seq = 0
+        self.committed_seq = 0
+        self.batch = new_journal_batch()  # the saves waiting for the next commit
+        self.lock = threading.Lock()
+        self.committed = threading.Condition(self.lock)
+        self.write_lock = threading.Lock()  # held while a batch is being written out
+        
+        os.makedirs(directory, exist_ok=True)
+        self.recover()
+        self.open_segment(self.seq + 1)
+        
+        commit_thread = threading.Thread(target=self.commit_loop)
+        commit_thread.daemon = True
+        commit_thread.start()
+        compact_thread = threading.Thread(target=self.compact_loop, args=(compact_interval,))
+        compact_thread.daemon = True
+        compact_thread.start()
+
+    def segments(self):
+        # Journal segments are named after the first sequence number they may hold
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith('journal-') and name.endswith('.log')]
+        return sorted(os.path.join(self.directory, name) for name in names)
+
+    def open_segment(self, start_seq):
+        self.segment_path = os.path.join(self.directory, f'journal-{start_seq:016d}.log')
+        self.file = open(self.segment_path, 'a', encoding='utf-8')
+        self.journal_bytes = self.file.tell()
+
+    def recover(self):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                self.seq = header['seq']
+                for line in f:
+                    record = json.loads(line)
+                    self.states[record['player']] = split_state(record['state'])
+        
+        for path in self.segments():
+            with open(path, 'r+', encoding='utf-8') as f:
+                offset = 0
+                for line in iter(f.readline, ''):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash: drop the incomplete tail
+                        print(f"Truncating journal {path} at offset {offset}")
+                        f.truncate(offset)
+                        break
+                    offset += len(line.encode('utf-8'))
+                    if record['seq'] > self.seq:
+                        self.replay(record)
+                        self.seq = record['seq']
+        self.committed_seq = self.seq
+
+    def replay(self, record):
+        if 'state' in record:
+            # Journals written before records held only the changed fields
+            self.states[record['player']] = split_state(record['state'])
+            return
+        fields = dict(self.states.get(record['player'], {}))
+        fields.update(split_state(record['set']))
+        for key in record['unset']:
+            fields.pop(key, None)
+        self.states[record['player']] = fields
+
+    def get(self, player_id):
+        with self.lock:
+            fields = self.states.get(player_id)
+        if fields is None:
+            return None
+        return json.loads(join_state(fields))
+
+    def put(self, player_id, state, event=None):
+        self.put_many([(player_id, serialize_state(state), event)])
+
+    def put_many(self, items):
+        now = time.time()
+        items = [(player_id, split_state(json.loads(payload)), event) for player_id, payload, event in items]
+        with self.lock:
+            batch = self.batch
+            for player_id, fields, event in items:
+                old = self.states.get(player_id)
+                self.seq += 1
+                self.states[player_id] = fields
+                record = {'seq': self.seq, 'ts': now, 'player': player_id, 'event': event, 'old': old, 'fields': fields}
+                record['line'] = journal_line(record, old or {})
+                batch['records'].append(record)
+            self.committed.notify_all()
             
-            if activity == 'generate':
-                bot.generate_number()
-            elif activity == 'gamble':
-                bot.gamble()
-            elif activity == 'buy_item':
-                bot.buy_item()
+            # Wait for the committer to fsync the batch holding our records
+            while not batch['done']:
+                self.committed.wait()
+            if batch['error'] is not None:
+                raise batch['error']
+
+    def player_ids(self):
+        with self.lock:
+            return list(self.states.keys())
+
+    def commit_loop(self):
+        retry_delay = JOURNAL_RETRY_DELAY
+        while True:
+            with self.lock:
+                while not self.batch['records']:
+                    self.committed.wait()
+                batch = self.batch
+                self.batch = new_journal_batch()
             
-            # Add longer delays between actions to simulate human behavior
-            # Random delay between 30-120 seconds (30 seconds to 2 minutes)
-            time.sleep(random.uniform(30, 120))
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                print(f"Error writing game journal: {e}")
+                self.fail_batch(batch, e)
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, JOURNAL_MAX_RETRY_DELAY)
+                continue
+            retry_delay = JOURNAL_RETRY_DELAY
+            
+            with self.lock:
+                self.committed_seq = batch['records'][-1]['seq']
+                batch['done'] = True
+                self.committed.notify_all()
+
+    def write_batch(self, batch):
+        with self.write_lock:
+            data = ''.join(record['line'] for record in batch['records'])
+            try:
+                self.file.write(data)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except Exception:
+                # Cut off whatever part of the batch made it to the segment,
+                # so the next batch doesn't follow a torn line
+                try:
+                    self.file.close()
+                except Exception:
+                    pass
+                os.truncate(self.segment_path, self.journal_bytes)
+                self.file = open(self.segment_path, 'a', encoding='utf-8')
+                raise
+            self.journal_bytes += len(data.encode('utf-8'))
+
+    def fail_batch(self, batch, error):
+        with self.lock:
+            failed_players = {record['player'] for record in batch['records']}
+            # Players who saved again since: their next record was diffed
+            # against a state the journal never got, so it becomes a full one
+            resaved = set()
+            for record in self.batch['records']:
+                if record['player'] in failed_players and record['player'] not in resaved:
+                    record['line'] = journal_line(record)
+                    resaved.add(record['player'])
+            # Everyone else goes back to the state they had before the batch
+            for record in reversed(batch['records']):
+                if record['player'] in resaved:
+                    continue
+                if record['old'] is None:
+                    self.states.pop(record['player'], None)
+                else:
+                    self.states[record['player']] = record['old']
+            batch['error'] = error
+            batch['done'] = True
+            self.committed.notify_all()
+
+    def compact_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            if self.journal_bytes < self.max_journal_bytes:
+                continue
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting game journal: {e}")
+
+    def compact(self):
+        # Switch to a fresh segment between two commits. Everything up to
+        # committed_seq is in the old segments; the snapshot may already contain
+        # newer states, which is fine because journal records set fields to
+        # absolute values, so replaying them on a newer state changes nothing.
+        with self.write_lock:
+            with self.lock:
+                snapshot_seq = self.committed_seq
+                states = dict(self.states)
+            old_segments = self.segments()
+            self.file.close()
+            self.open_segment(snapshot_seq + 1)
         
-        # Sleep before next round of bot activities
-        time.sleep(60)  # Wait a minute before the next round
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'seq': snapshot_seq}) + '\n')
+            for player_id, fields in states.items():
+                f.write(f'{{"player":{json.dumps(player_id)},"state":{join_state(fields)}}}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        fsync_directory(self.directory)
+        
+        for path in old_segments:
+            if path != self.segment_path:
+                os.remove(path)
 
-# Initialize bot thread when the app is created
-bot_thread = threading.Thread(target=bot_activity_thread)
-bot_thread.daemon = True
-bot_thread.start()
+def new_journal_batch():
+    return {'records': [], 'done': False, 'error': None}
+
+def journal_line(record, old=None):
+    # The record's journal line: the fields that changed since old, or the
+    # full state when there is nothing to diff against
+    head = (f'{{"seq":{record["seq"]},"ts":{record["ts"]:.3f},"player":{json.dumps(record["player"])},'
+            f'"event":{json.dumps(record["event"])}')
+    fields = record['fields']
+    if old is None:
+        return f'{head},"state":{join_state(fields)}}}\n'
+    changed = {key: value for key, value in fields.items() if old.get(key) != value}
+    removed = [key for key in old if key not in fields]
+    return f'{head},"set":{join_state(changed)},"unset":{json.dumps(removed)}}}\n'
+
+class StateConflict(Exception):
+    # Another worker saved this player since we loaded it
+    pass
 
-def load_game_data():
+def serialize_state(state):
+    return json.dumps(state, separators=(',', ':'))
+
+def split_state(state):
+    # A state's top-level fields with their serialized values
+    return {key: serialize_state(value) for key, value in state.items()}
+
+def join_state(fields):
+    # The serialized state made of split_state() fields
+    return '{' + ','.join(f'{json.dumps(key)}:{value}' for key, value in fields.items()) + '}'
+
+def fsync_directory(path):
+    # Make a rename inside the directory durable
+    fd = os.open(path, os.O_RDONLY)
     try:
-        with open('game_data.json', 'r') as f:
-            data = json.load(f)
-            
-            # Ensure inventory has the correct structure
-            if 'inventory' not in data:
-                data['inventory'] = {}
-                
-            # Ensure each rarity category exists in inventory
-            for rarity in item_rarities.keys():
-                if rarity not in data['inventory']:
-                    data['inventory'][rarity] = []
-                    
-            return data
-    except FileNotFoundError:
-        # Initialize with default values if file doesn't exist
-        return {
-            'coins': 1000,
-            'stats': {
-                'total_rolls': 0,
-                'best_number': 0,
-                'total_numbers': 0
-            },
-            'inventory': {rarity: [] for rarity in item_rarities.keys()},
-            'active_auras': [],
-            'game_passes': {
-                'triple_generate': False,
-                'double_luck': False,
-                'auto_generate': False
-            },
-            'auto_generate_active': False,
-            'number_limit': 1000000,
-            'prestige': {
-                'level': 0,
-                'multiplier': 1.0,
-                'points': 0,
-                'upgrades': {
-                    'coin_multiplier': 0,
-                    'luck_boost': 0,
-                    'limit_increase': 0
-                }
-            },
-            'daily_rewards': {
-                'last_claim': None,
-                'streak': 0
-            },
-            'achievements': {
-                'unlocked': []
-            },
-            'market': {}
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Process-local write-behind cache in front of the state store. Hot players are
+# served from memory, saves only mark the entry dirty, and dirty entries are
+# written back on an interval, on eviction and at shutdown.
+#
+# In shared mode (several worker processes on one store) the cache is
+# write-through instead: each entry remembers the store version it was read
+# at, hits are revalidated against the store's version number, and saves are
+# compare-and-swaps that raise StateConflict if another worker got there first.
+class StateCache:
+    def __init__(self, store, max_bytes, flush_interval, shared=False):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.flush_interval = 0 if shared else flush_interval
+        self.shared = shared
+        self.entries = OrderedDict()  # player_id -> entry, least recently used first
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        
+        if self.flush_interval > 0:
+            flush_thread = threading.Thread(target=self.flush_loop)
+            flush_thread.daemon = True
+            flush_thread.start()
+        atexit.register(self.flush)
+
+    def get(self, player_id):
+        # Returns (state, version); version is only meaningful in shared mode
+        current_version = self.store.version(player_id) if self.shared else 0
+        with self.lock:
+            entry = self.entries.get(player_id)
+            if entry is not None and entry['version'] == current_version:
+                self.entries.move_to_end(player_id)
+                metrics.observe('state_load_bytes', entry['size'])
+                return entry['state'], entry['version']
+        
+        if self.shared:
+            state, version = self.store.get_versioned(player_id)
+        else:
+            state, version = self.store.get(player_id), 0
+        if state is None:
+            return None, 0
+        
+        with self.lock:
+            # Another thread may have loaded the same player in the meantime
+            entry = self.entries.get(player_id)
+            if entry is not None and entry['version'] == version:
+                self.entries.move_to_end(player_id)
+                return entry['state'], entry['version']
+            if entry is not None:
+                self.total_bytes -= entry['size']
+            size = len(serialize_state(state))
+            self.insert(player_id, state, None, size, version=version)
+        metrics.observe('state_load_bytes', size)
+        return state, version
+
+    def put(self, player_id, state, event=None, expected_version=None):
+        # The state is serialized now so the flusher never walks a dict that a
+        # request thread is still mutating
+        payload = serialize_state(state)
+        metrics.observe('state_save_bytes', len(payload))
+        write_through = self.flush_interval <= 0
+        pending = None if write_through else payload
+        version = 0
+        
+        # Write-through saves reach the store before the cache entry is
+        # updated. The saved dict is usually the cached one, changed in place,
+        # so if the write fails the entry is dropped and the next load reads
+        # what the store actually has.
+        try:
+            if self.shared and expected_version is None:
+                # Saved without being loaded first (e.g. a full reset): plain overwrite
+                self.store.put_many([(player_id, payload, event)])
+                version = self.store.version(player_id)
+            elif self.shared:
+                version = self.store.compare_and_set(player_id, payload, event, expected_version)
+            elif write_through:
+                # Written outside the cache lock so concurrent saves can share a commit
+                self.store.put_many([(player_id, payload, event)])
+        except Exception:
+            self.invalidate(player_id)
+            raise
+        
+        with self.lock:
+            entry = self.entries.get(player_id)
+            if entry is None:
+                self.insert(player_id, state, pending, len(payload), event, version)
+            else:
+                self.total_bytes += len(payload) - entry['size']
+                entry['state'] = state
+                entry['pending'] = pending
+                entry['size'] = len(payload)
+                entry['event'] = event
+                entry['version'] = version
+                self.entries.move_to_end(player_id)
+            self.evict()
+        return version
+
+    def insert(self, player_id, state, pending, size, event=None, version=0):
+        self.entries[player_id] = {
+            'state': state,
+            'pending': pending,
+            'size': size,
+            'event': event,
+            'version': version
         }
+        self.total_bytes += size
+
+    def evict(self):
+        # Drop least recently used players until we're back under the budget,
+        # writing back any unsaved changes first. If that write fails, the
+        # unsaved players stay cached (over budget) until a flush gets them out.
+        victims = []
+        remaining = self.total_bytes
+        for player_id, entry in self.entries.items():
+            if remaining <= self.max_bytes or len(victims) >= len(self.entries) - 1:
+                break
+            victims.append(player_id)
+            remaining -= entry['size']
+        writes = [
+            (player_id, self.entries[player_id]['pending'], self.entries[player_id]['event'])
+            for player_id in victims if self.entries[player_id]['pending'] is not None
+        ]
+        if writes:
+            try:
+                self.store.put_many(writes)
+            except Exception as e:
+                print(f"Error writing back evicted game data: {e}")
+                victims = [player_id for player_id in victims if self.entries[player_id]['pending'] is None]
+        for player_id in victims:
+            self.total_bytes -= self.entries.pop(player_id)['size']
+
+    def invalidate(self, player_id):
+        with self.lock:
+            entry = self.entries.pop(player_id, None)
+            if entry is not None:
+                self.total_bytes -= entry['size']
+
+    def flush(self):
+        # Entries are only marked clean once the write went through; if it
+        # raises, they stay dirty for the next flush
+        with self.lock:
+            writes = [
+                (player_id, entry['pending'], entry['event'])
+                for player_id, entry in self.entries.items() if entry['pending'] is not None
+            ]
+            if writes:
+                self.store.put_many(writes)
+            for player_id, payload, event in writes:
+                self.entries[player_id]['pending'] = None
+        return len(writes)
+
+    def flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing game data: {e}")
+
+def create_state_store(backend=STATE_BACKEND):
+    if backend == 'sqlite' and STATE_SHARDS > 1:
+        store = ShardedStateStore(state_shard_paths(STATE_SHARDS), STATE_SHARD_VNODES)
+    elif backend == 'sqlite':
+        store = SQLiteStateStore(STATE_DB_FILE)
+    elif backend == 'journal':
+        if STATE_SHARED:
+            raise ValueError('The journal state backend only supports a single worker process')
+        store = JournalStateStore(STATE_JOURNAL_DIR, STATE_JOURNAL_MAX_BYTES, STATE_COMPACT_INTERVAL)
+    else:
+        raise ValueError(f'Unknown state backend: {backend}')
+    
+    # One-time import of the old single-file save
+    if store.get(DEFAULT_PLAYER_ID) is None and os.path.exists(GAME_DATA_FILE):
+        with open(GAME_DATA_FILE, 'r') as f:
+            store.put(DEFAULT_PLAYER_ID, json.load(f))
+    
+    return store
+
+def default_game_data():
+    return {
+        'coins': 1000,
+        'stats': {
+            'total_rolls': 0,
+            'best_number': 0,
+            'total_numbers': 0
+        },
+        'inventory': {rarity: {} for rarity in item_rarities.keys()},
+        'active_auras': [],
+        'auras_collected': [],
+        'game_passes': {
+            'triple_generate': False,
+            'double_luck': False,
+            'auto_generate': False
+        },
+        'auto_generate_active': False,
+        'number_limit': 1000000,
+        'prestige': {
+            'level': 0,
+            'multiplier': 1.0,
+            'points': 0,
+            'total_resets': 0,
+            'upgrades': {
+                'coin_multiplier': 0,
+                'luck_boost': 0,
+                'limit_increase': 0
+            }
+        },
+        'daily_rewards': {
+            'last_claim': None,
+            'streak': 0
+        },
+        'achievements': {
+            'unlocked': []
+        },
+        'target_numbers': default_target_numbers()
+    }
+
+def default_target_numbers():
+    # Rolls at or above a target pay its reward on top of the roll's coins
+    return {
+        'easy': 100000,
+        'medium': 500000,
+        'hard': 900000,
+        'rewards': {'easy': 100, 'medium': 500, 'hard': 2500}
+    }
+
+def load_game_data(player_id=None):
+    if player_id is None:
+        player_id = current_player_id()
+    started = time.perf_counter()
+    data, version = state_cache.get(player_id)
+    metrics.observe('state_load_duration_seconds', time.perf_counter() - started)
+    # Remember which version this thread read, so the save can detect lost updates
+    loaded_versions.versions[player_id] = version
+    if data is None:
+        # Initialize with default values if the player has no saved state yet
+        data = default_game_data()
+        seed_player_rng(player_id, data)
+        return data
+    # The cached dict is shared by every request for this player, so it is only
+    # changed (RNG sequence, aura expiry, upgrades of old saves) under the
+    # player's lock, which transactions already hold
+    with player_lock(player_id):
+        seed_player_rng(player_id, data)
+        
+        # Put older saves' auras on the expiry index, then drop expired auras
+        if 'auras_collected' not in data:
+            index_auras(data)
+        expire_auras(data)
+        
+        # The market is global now; older saves carried a per-player copy
+        data.pop('market', None)
+        
+        # Saves from before target numbers existed
+        if 'target_numbers' not in data:
+            data['target_numbers'] = default_target_numbers()
+        
+        # Ensure inventory has the correct structure
+        if 'inventory' not in data:
+            data['inventory'] = {}
+        
+        # Ensure each rarity category exists in inventory, as item name -> count
+        for rarity in item_rarities.keys():
+            if rarity not in data['inventory']:
+                data['inventory'][rarity] = {}
+            elif isinstance(data['inventory'][rarity], list):
+                data['inventory'][rarity] = count_inventory_items(data['inventory'][rarity])
+        
+    return data
 
-def save_game_data(game_data):
+def save_game_data(game_data, player_id=None, event=None):
+    if player_id is None:
+        player_id = current_player_id()
+    # Journal records are tagged with what caused them (the route by default)
+    if event is None and has_request_context():
+        event = request.endpoint
+    
     try:
         if 'active_auras' not in game_data:
             game_data['active_auras'] = []
@@ -560,13 +1961,194 @@ def save_game_data(game_data):
         if 'auto_generate_active' not in game_data:
             game_data['auto_generate_active'] = False
         
-        with open(GAME_DATA_FILE, 'w') as f:
-            json.dump(game_data, f, indent=4)
+        started = time.perf_counter()
+        expected_version = loaded_versions.versions.get(player_id)
+        loaded_versions.versions[player_id] = state_cache.put(player_id, game_data, event, expected_version)
+        metrics.observe('state_save_duration_seconds', time.perf_counter() - started)
+        if session_recorder.file is not None and has_request_context():
+            g.state_digest = state_digest(game_data)
+        leaderboard_index.update_player(player_id, game_data, loaded_versions.versions[player_id])
         return True
+    except StateConflict:
+        raise
     except Exception as e:
+        metrics.inc('state_save_errors_total')
         print(f"Error saving game data: {e}")
         return False
 
+state_store = create_state_store()
+state_cache = StateCache(state_store, STATE_CACHE_MAX_BYTES, STATE_FLUSH_INTERVAL, STATE_SHARED)
+
+class LoadedVersions(threading.local):
+    def __init__(self):
+        self.versions = {}
+
+loaded_versions = LoadedVersions()
+
+# Player transactions: handlers that modify a player's state run under that
+# player's lock (so threads in this worker take turns), and if another worker
+# saved the player in between, the handler is re-run on the fresh state.
+player_locks = [threading.RLock() for _ in range(64)]
+
+def player_lock(player_id):
+    return player_locks[hash(player_id) % len(player_locks)]
+
+def current_player_id():
+    # The player behind this request: the one an admin action names with
+    # player_id, or else the visitor's own player, whose id is kept in the
+    # session cookie (and created on their first request)
+    if not has_request_context():
+        return DEFAULT_PLAYER_ID
+    player_id = g.get('player_id')
+    if player_id is None:
+        if request.path.startswith('/admin') and session.get('admin_logged_in'):
+            player_id = request.values.get('player_id')
+            if player_id and player_id.startswith(RESERVED_ID_PREFIX):
+                abort(400, f'{player_id!r} is not a player')
+        if not player_id:
+            player_id = session.get('player_id')
+        if not player_id:
+            player_id = session['player_id'] = uuid.uuid4().hex
+            session.permanent = True
+        g.player_id = player_id
+    return player_id
+
+def run_player_transaction(player_id, f, *args, **kwargs):
+    with player_lock(player_id):
+        for attempt in range(STATE_MAX_RETRIES):
+            loaded_versions.versions.pop(player_id, None)
+            try:
+                # Metrics recorded by an attempt only count if it goes through
+                with metrics.deferred():
+                    return f(*args, **kwargs)
+            except StateConflict:
+                metrics.inc('state_conflicts_total')
+                state_cache.invalidate(player_id)
+                time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+    raise StateConflict(player_id)
+
+# Server-side auto generate: players with the pass and auto generate switched
+# on are rolled for in batched ticks, at the rate a client clicking generate
+# would have managed. Each tick is one batch and one save per player, and the
+# results pile up in auto_generate_results until the client fetches them.
+auto_generate_players = set()
+
+def auto_generate_tick(player_id):
+    game_data = load_game_data(player_id)
+    if not (game_data['game_passes'].get('auto_generate') and game_data.get('auto_generate_active')):
+        auto_generate_players.discard(player_id)
+        return
+    
+    # Roll for the time elapsed since the last tick. Because this lives in the
+    # player's state, several workers ticking the same player don't double up.
+    now = game_time()
+    last_tick = game_data.get('auto_generate_last_tick') or now
+    count = int((now - last_tick) * AUTO_GENERATE_RATE)
+    if count <= 0:
+        return
+    game_data['auto_generate_last_tick'] = last_tick + count / AUTO_GENERATE_RATE
+    
+    result = apply_roll_batch(game_data, count, source='auto_generate')
+    
+    # Merge into what the client hasn't fetched yet
+    results = game_data.get('auto_generate_results') or {
+        'rolls': 0,
+        'coins_earned': 0,
+        'best_number': 0,
+        'target_hits': {},
+        'new_achievements': []
+    }
+    results['rolls'] += result['rolls']
+    results['coins_earned'] += result['coins_earned']
+    results['best_number'] = max(results['best_number'], result['best_number'])
+    for target, hits in result['target_hits'].items():
+        results['target_hits'][target] = results['target_hits'].get(target, 0) + hits
+    results['new_achievements'].extend(result['new_achievements'])
+    game_data['auto_generate_results'] = results
+    
+    save_game_data(game_data, player_id, event='auto_generate')
+
+def scan_saved_players():
+    # Index saved players for the leaderboard and pick up players who had
+    # auto generate running before a restart. States are read straight from
+    # the store, so the scan doesn't fill the cache with every player.
+    for player_id in state_store.player_ids():
+        if player_id.startswith(RESERVED_ID_PREFIX):
+            continue
+        game_data = state_store.get(player_id)
+        if game_data is None:
+            continue
+        leaderboard_index.update_player(player_id, game_data)
+        if game_data.get('auto_generate_active'):
+            auto_generate_players.add(player_id)
+
+def auto_generate_thread():
+    scan_saved_players()
+    
+    while True:
+        time.sleep(AUTO_GENERATE_TICK)
+        for player_id in list(auto_generate_players):
+            try:
+                run_player_transaction(player_id, auto_generate_tick, player_id)
+            except Exception as e:
+                print(f"Error auto generating for {player_id}: {e}")
+
+# Active auras are kept ordered by expiry time, so the list itself is the
+# expiry index: the next aura to run out is always active_auras[0], and
+# expired ones are found by binary search and dropped from the front.
+def activate_aura(game_data, aura_id, now=None):
+    now = game_time() if now is None else now
+    aura = auras[aura_id]
+    bisect.insort(game_data['active_auras'], {
+        'id': aura_id,
+        'name': aura['name'],
+        'effect': aura['effect'],
+        'duration': aura['duration'],
+        'activated_at': now,
+        'expires_at': now + aura['duration_seconds']
+    }, key=aura_expiry)
+    
+    if aura_id not in game_data['auras_collected']:
+        game_data['auras_collected'].append(aura_id)
+    invalidate_luck(game_data)
+
+def aura_expiry(aura):
+    return aura['expires_at']
+
+def expire_auras(game_data, now=None):
+    active_auras = game_data['active_auras']
+    now = game_time() if now is None else now
+    if not active_auras or active_auras[0]['expires_at'] > now:
+        return False
+    
+    expired = bisect.bisect_right(active_auras, now, key=aura_expiry)
+    del active_auras[:expired]
+    invalidate_luck(game_data)
+    return True
+
+def index_auras(game_data):
+    # Bring saves from before aura expiry onto the expiry index: give every
+    # aura an expiry time (admin-given ones were stored as bare ids) and sort
+    active_auras = []
+    for aura in game_data.get('active_auras', []):
+        if isinstance(aura, str):
+            aura = {'id': aura, 'activated_at': game_time()}
+        if aura.get('id') not in auras:
+            continue
+        info = auras[aura['id']]
+        aura.update({
+            'name': info['name'],
+            'effect': info['effect'],
+            'duration': info['duration'],
+            'expires_at': aura['activated_at'] + info['duration_seconds']
+        })
+        active_auras.append(aura)
+    
+    active_auras.sort(key=aura_expiry)
+    game_data['active_auras'] = active_auras
+    game_data['auras_collected'] = sorted({aura['id'] for aura in active_auras})
+    invalidate_luck(game_data)
+
 def calculate_aura_multiplier(active_auras):
     multiplier = 1.0
     for aura in active_auras:
@@ -574,55 +2156,256 @@ def calculate_aura_multiplier(active_auras):
             multiplier *= auras[aura['id']]['multiplier']
     return multiplier
 
+def calculate_luck_multiplier(game_data):
+    # Calculate total multiplier from active auras
+    multiplier = calculate_aura_multiplier(game_data['active_auras'])
+    
+    # Apply double luck if owned
+    if game_data['game_passes']['double_luck']:
+        multiplier *= 2
+    
+    # Apply prestige multiplier
+    multiplier *= game_data['prestige']['multiplier']
+    
+    # Apply luck boost from prestige
+    luck_boost_level = game_data['prestige'].get('luck_boost', 0)
+    if luck_boost_level > 0:
+        luck_boost = prestige_upgrades['luck_boost']['effect'] * luck_boost_level
+        multiplier *= (1 + luck_boost)
+    
+    return multiplier
+
+# The roll distribution: a roll is floor(Y) with Y = U ** (1/0.7) and U
+# uniform on [1, limit ** 0.7], which makes high numbers rarer. One instance
+# per number limit holds the precomputed bounds and moments, and every roll in
+# the game (players, gambles and bots) goes through it.
+class RollDistribution:
+    exponent = 0.7
+
+    def __init__(self, number_limit):
+        a = self.exponent
+        b = 1 / a
+        self.number_limit = number_limit
+        self.inverse = b
+        self.upper = number_limit ** a
+        self.span = self.upper - 1
+        # Moments of the continuous Y
+        self.mean = (self.upper ** (b + 1) - 1) / ((b + 1) * self.span)
+        self.variance = (self.upper ** (2 * b + 1) - 1) / ((2 * b + 1) * self.span) - self.mean ** 2
+
+    def sample(self):
+        return int((1 + self.span * rng.random()) ** self.inverse)
+
+    def sample_many(self, count):
+        return (rng.generator.uniform(1, self.upper, count) ** self.inverse).astype(np.int64)
+
+    def level(self, y):
+        # P(Y < y), for a scalar or an array
+        if np.ndim(y) == 0:
+            return (min(max(y, 1), self.number_limit) ** self.exponent - 1) / self.span
+        return (np.clip(y, 1, self.number_limit) ** self.exponent - 1) / self.span
+
+    def quantile(self, q):
+        # The y with P(Y < y) = q, for a scalar or an array
+        return (1 + np.multiply(q, self.span)) ** self.inverse
+
+    def cdf(self, n):
+        # P(roll <= n)
+        return self.level(np.add(n, 1))
+
+    def ppf(self, q):
+        # The roll at cumulative probability q
+        return np.floor(self.quantile(q)).astype(np.int64) if np.ndim(q) else int(self.quantile(q))
+
+    def tail(self, n):
+        # P(roll >= n)
+        return 1 - self.level(n)
+
+    def range_probability(self, low, high):
+        # P(low <= roll <= high). The bounds are clamped to the possible rolls
+        # first, so any int works, however large
+        if np.ndim(low) == 0 and np.ndim(high) == 0:
+            low = min(max(low, 1), self.number_limit)
+            high = min(max(high, 0), self.number_limit)
+        else:
+            low = np.clip(low, 1, self.number_limit)
+            high = np.clip(high, 0, self.number_limit)
+        return self.level(high + 1) - self.level(low)
+
+roll_distributions = {}  # number_limit -> RollDistribution
+
+def roll_distribution(number_limit):
+    distribution = roll_distributions.get(number_limit)
+    if distribution is None:
+        distribution = RollDistribution(number_limit)
+        if len(roll_distributions) >= ROLL_DISTRIBUTION_CACHE_SIZE:
+            roll_distributions.clear()
+        roll_distributions[number_limit] = distribution
+    return distribution
+
+# Derived luck cache. The combined luck multiplier and the roll distribution
+# only change when auras, passes, prestige or the number limit do, and those
+# events call invalidate_luck() to give the player's state a fresh luck_epoch
+# token. Rolls look the token up here instead of recomputing the multiplier.
+luck_cache = {}  # luck_epoch -> (multiplier, distribution)
+
+def invalidate_luck(game_data):
+    game_data['luck_epoch'] = os.urandom(8).hex()
+
+def get_luck(game_data):
+    # Returns (luck multiplier, roll distribution for the player's number limit)
+    epoch = game_data.get('luck_epoch')
+    if epoch is None:
+        invalidate_luck(game_data)
+        epoch = game_data['luck_epoch']
+    
+    luck = luck_cache.get(epoch)
+    if luck is None:
+        luck = (calculate_luck_multiplier(game_data), roll_distribution(game_data['number_limit']))
+        if len(luck_cache) >= LUCK_CACHE_SIZE:
+            luck_cache.clear()
+        luck_cache[epoch] = luck
+    return luck
+
+def gamble_odds(number_limit, min_vals, max_vals):
+    # Exact chance that a gamble roll lands in [min_val, max_val], and the
+    # fair payout multiplier for it (capped, and 0 for ranges that can't hit)
+    probability = roll_distribution(number_limit).range_probability(min_vals, max_vals)
+    with np.errstate(divide='ignore'):
+        payout = np.where(probability > 0, np.minimum(1 / probability, MAX_GAMBLE_PAYOUT), 0)
+    return probability, payout
+
+def parse_gamble_range(target_range, number_limit):
+    # (min_val, max_val), or None if it isn't a valid "min-max" range within
+    # 1..number_limit (which also keeps the bounds in NumPy's int64 range)
+    try:
+        min_val, max_val = map(int, target_range.split('-'))
+    except:
+        return None
+    if not 1 <= min_val < max_val <= number_limit:
+        return None
+    return min_val, max_val
+
+def summarize_rolls(number_limit, count, thresholds):
+    # Total, best and per-threshold hit counts (rolls >= threshold) of `count`
+    # generate_number rolls. Small batches are drawn roll by roll; big ones are
+    # sampled in constant time from the distribution itself (see below).
+    if count <= EXACT_ROLL_BATCH:
+        rolls = roll_distribution(number_limit).sample_many(count)
+        hits = [int(np.count_nonzero(rolls >= t)) for t in thresholds]
+        return int(rolls.sum()), int(rolls.max()), hits
+    return summarize_rolls_closed_form(number_limit, count, thresholds)
+
+def summarize_rolls_closed_form(number_limit, count, thresholds):
+    # From the roll distribution itself:
+    #  - hit counts: one multinomial draw over the bands between thresholds
+    #  - best roll: the max of the k rolls in the top non-empty band, which is
+    #    the band's inverse CDF at u ** (1/k)
+    #  - total: normal approximation from the exact mean and variance of Y
+    distribution = roll_distribution(number_limit)
+    
+    edges = sorted(set(thresholds))
+    levels = [0.0] + [distribution.level(t) for t in edges] + [1.0]
+    band_probs = [levels[i + 1] - levels[i] for i in range(len(levels) - 1)]
+    band_counts = rng.generator.multinomial(count, band_probs)
+    
+    # Rolls >= edges[i] are the ones in bands i+1 and up
+    hits_at_edge = {edge: int(band_counts[i + 1:].sum()) for i, edge in enumerate(edges)}
+    hits = [hits_at_edge[t] for t in thresholds]
+    
+    top = max(i for i in range(len(band_counts)) if band_counts[i] > 0)
+    lo, hi = levels[top], levels[top + 1]
+    u = math.exp(math.log(1.0 - rng.generator.random()) / int(band_counts[top]))
+    best = min(int(distribution.quantile(lo + (hi - lo) * u)), number_limit)
+    
+    # Flooring lowers each roll by 1/2 on average
+    total = count * (distribution.mean - 0.5) + math.sqrt(count * distribution.variance) * rng.generator.standard_normal()
+    total = int(min(max(total, count), count * number_limit))
+    
+    return total, best, hits
+
+def apply_roll_batch(game_data, count, source='generate_number_batch'):
+    # Apply `count` generates to game_data in aggregate and return a summary.
+    # Takes constant time for large counts, so it also serves as offline
+    # progress / catch-up for auto generate.
+    
+    # Triple generate gives three rolls per generate, like generate_number
+    if game_data['game_passes']['triple_generate']:
+        count *= 3
+    
+    multiplier, distribution = get_luck(game_data)
+    target_numbers = game_data.get('target_numbers')
+    targets = ('easy', 'medium', 'hard') if target_numbers else ()
+    total, best_base, hits = summarize_rolls(
+        game_data['number_limit'], count, [target_numbers[target] for target in targets]
+    )
+    best_boosted = int(best_base * multiplier)
+    
+    # Update stats in aggregate
+    game_data['stats']['total_rolls'] += count
+    game_data['stats']['total_numbers'] += total
+    game_data['stats']['best_number'] = max(game_data['stats']['best_number'], best_base)
+    
+    # 200 coins per roll, plus target rewards for every roll that hits a target
+    coins_earned = 200 * count
+    target_hits = dict(zip(targets, hits))
+    for target in targets:
+        coins_earned += target_hits[target] * target_numbers['rewards'][target]
+    game_data['coins'] += coins_earned
+    metrics.inc('rolls_total', count, source=source)
+    metrics.inc('coins_minted_total', coins_earned, source=source)
+    
+    # Check for new achievements
+    new_achievements = check_achievements(game_data)
+    
+    return {
+        'rolls': count,
+        'best_number': best_base,
+        'best_boosted_number': best_boosted,
+        'best_probability': distribution.tail(best_base),
+        'best_boosted_probability': distribution.tail(best_base) / multiplier,
+        'multiplier': multiplier,
+        'target_hits': target_hits,
+        'coins_earned': coins_earned,
+        'new_achievements': new_achievements
+    }
+
 def check_achievements(game_data):
     """Check and update achievements based on current game state"""
-    new_achievements = []
+    progress = achievement_progress(game_data)
     
-    # Check roll count achievements
-    if game_data['stats']['total_rolls'] >= 100 and 'rolls_100' not in game_data['achievements']['unlocked']:
-        new_achievements.append('rolls_100')
-    if game_data['stats']['total_rolls'] >= 1000 and 'rolls_1000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('rolls_1000')
-    if game_data['stats']['total_rolls'] >= 10000 and 'rolls_10000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('rolls_10000')
-    
-    # Check best number achievements
-    if game_data['stats']['best_number'] >= 1000 and 'best_1000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('best_1000')
-    if game_data['stats']['best_number'] >= 10000 and 'best_10000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('best_10000')
-    if game_data['stats']['best_number'] >= 100000 and 'best_100000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('best_100000')
-    if game_data['stats']['best_number'] >= 1000000 and 'best_1000000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('best_1000000')
-    
-    # Check coin achievements
-    if game_data['coins'] >= 10000 and 'coins_10000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('coins_10000')
-    if game_data['coins'] >= 100000 and 'coins_100000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('coins_100000')
-    if game_data['coins'] >= 1000000 and 'coins_1000000' not in game_data['achievements']['unlocked']:
-        new_achievements.append('coins_1000000')
-    
-    # Check aura collection achievement
-    aura_ids = [aura['id'] for aura in game_data['active_auras']]
-    all_aura_ids = set(auras.keys())
-    if all(aura_id in aura_ids for aura_id in all_aura_ids) and 'all_auras' not in game_data['achievements']['unlocked']:
-        new_achievements.append('all_auras')
-    
-    # Check game pass achievement
-    if all(game_data['game_passes'].values()) and 'all_passes' not in game_data['achievements']['unlocked']:
-        new_achievements.append('all_passes')
+    # Threshold achievements: one comparison per stat against the next unlock
+    new_achievements = []
+    for stat, next_threshold in progress['next'].items():
+        if next_threshold is None:
+            continue
+        value = achievement_stat(game_data, stat)
+        if value < next_threshold:
+            continue
+        for threshold, achievement_id in achievement_thresholds[stat]:
+            if threshold > value:
+                break
+            if not progress['mask'] & achievement_bits[achievement_id]:
+                new_achievements.append(achievement_id)
+    
+    # Collection achievements
+    for achievement_id, is_complete in achievement_checks.items():
+        if not progress['mask'] & achievement_bits[achievement_id] and is_complete(game_data):
+            new_achievements.append(achievement_id)
     
     # Add new achievements and award coins
     for achievement_id in new_achievements:
-        if achievement_id not in game_data['achievements']['unlocked']:
-            game_data['achievements']['unlocked'].append(achievement_id)
-            game_data['coins'] += achievements[achievement_id]['reward']
+        progress['unlocked'].append(achievement_id)
+        progress['mask'] |= achievement_bits[achievement_id]
+        game_data['coins'] += achievements[achievement_id]['reward']
+        metrics.inc('coins_minted_total', achievements[achievement_id]['reward'], source='achievement')
+    if new_achievements:
+        progress['next'] = next_achievement_thresholds(progress['mask'])
     
     return new_achievements
 
 @app.route('/')
+@player_read
 def index():
     game_data = load_game_data()
     return render_template('index.html', 
@@ -634,6 +2417,7 @@ def index():
                          game_items=game_items)
 
 @app.route('/buy_pack', methods=['POST'])
+@player_transaction
 def buy_pack():
     pack_id = request.form.get('item_id')
     if pack_id not in shop_items:
@@ -643,6 +2427,7 @@ def buy_pack():
     pack = shop_items[pack_id]
     
     game_data['coins'] += pack['coins']
+    metrics.inc('coins_minted_total', pack['coins'], source='purchase')
     
     if not save_game_data(game_data):
         return jsonify({'success': False, 'message': 'Error saving game data!'})
@@ -654,6 +2439,7 @@ def buy_pack():
     })
 
 @app.route('/buy_aura', methods=['POST'])
+@player_transaction
 def buy_aura():
     aura_id = request.form.get('aura_id')
     if aura_id not in auras:
@@ -668,16 +2454,7 @@ def buy_aura():
         
         game_data['coins'] -= aura['coins']
         
-        if 'active_auras' not in game_data:
-            game_data['active_auras'] = []
-            
-        game_data['active_auras'].append({
-            'id': aura_id,
-            'name': aura['name'],
-            'effect': aura['effect'],
-            'duration': aura['duration'],
-            'activated_at': time.time()
-        })
+        activate_aura(game_data, aura_id)
         
         if not save_game_data(game_data):
             return jsonify({'success': False, 'message': 'Error saving game data!'})
@@ -692,6 +2469,7 @@ def buy_aura():
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'})
 
 @app.route('/buy_game_pass', methods=['POST'])
+@player_transaction
 def buy_game_pass():
     pass_id = request.form.get('pass_id')
     game_data = load_game_data()
@@ -713,6 +2491,7 @@ def buy_game_pass():
     # For this demo, we'll just simulate a successful purchase
     
     game_data['game_passes'][pass_id] = True
+    invalidate_luck(game_data)
     
     if not save_game_data(game_data):
         return jsonify({'success': False, 'message': 'Error saving game data!'})
@@ -724,6 +2503,7 @@ def buy_game_pass():
     })
 
 @app.route('/toggle_auto_generate', methods=['POST'])
+@player_transaction
 def toggle_auto_generate():
     game_data = load_game_data()
     
@@ -732,9 +2512,16 @@ def toggle_auto_generate():
     
     game_data['auto_generate_active'] = not game_data['auto_generate_active']
     
+    # Rolls are accumulated by the server from now on
+    if game_data['auto_generate_active']:
+        game_data['auto_generate_last_tick'] = game_time()
+    
     if not save_game_data(game_data):
         return jsonify({'success': False, 'message': 'Error saving game data!'})
     
+    if game_data['auto_generate_active']:
+        auto_generate_players.add(current_player_id())
+    
     status = "activated" if game_data['auto_generate_active'] else "deactivated"
     return jsonify({
         'success': True,
@@ -742,7 +2529,27 @@ def toggle_auto_generate():
         'is_active': game_data['auto_generate_active']
     })
 
+@app.route('/get_auto_generate_results', methods=['POST'])
+@player_transaction
+def get_auto_generate_results():
+    game_data = load_game_data()
+    results = game_data.get('auto_generate_results')
+    
+    # Hand over what the server rolled since the last fetch
+    if results:
+        game_data['auto_generate_results'] = None
+        save_game_data(game_data)
+    
+    return jsonify({
+        'success': True,
+        'is_active': game_data['auto_generate_active'],
+        'results': results,
+        'stats': game_data['stats'],
+        'new_balance': game_data['coins']
+    })
+
 @app.route('/increase_limit', methods=['POST'])
+@player_transaction
 def increase_limit():
     game_data = load_game_data()
     
@@ -757,6 +2564,7 @@ def increase_limit():
     
     # Increase the limit by 100 million
     game_data['number_limit'] += 100000000
+    invalidate_luck(game_data)
     
     if not save_game_data(game_data):
         return jsonify({'success': False, 'message': 'Error saving game data!'})
@@ -769,6 +2577,7 @@ def increase_limit():
     })
 
 @app.route('/prestige', methods=['POST'])
+@player_transaction
 def prestige():
     game_data = load_game_data()
     
@@ -785,7 +2594,7 @@ def prestige():
     # Update prestige data
     game_data['prestige']['level'] += 1
     game_data['prestige']['multiplier'] = new_multiplier
-    game_data['prestige']['total_resets'] += 1
+    game_data['prestige']['total_resets'] = game_data['prestige'].get('total_resets', 0) + 1
     
     # Reset game data but keep prestige and owned passes
     owned_passes = game_data.get('game_passes', {}).values()
@@ -800,6 +2609,7 @@ def prestige():
             'best_number': 0
         },
         'active_auras': [],
+        'auras_collected': game_data.get('auras_collected', []),
         'game_passes': {
             'triple_generate': False,
             'double_luck': False,
@@ -810,8 +2620,10 @@ def prestige():
             'last_claim': None,
             'streak': 0
         },
-        'prestige': prestige_data
+        'prestige': prestige_data,
+        'rng_sequence': game_data.get('rng_sequence', 0)
     }
+    invalidate_luck(game_data)
     
     # Save game data
     save_game_data(game_data)
@@ -825,6 +2637,7 @@ def prestige():
     })
 
 @app.route('/buy_prestige_upgrade', methods=['POST'])
+@player_transaction
 def buy_prestige_upgrade():
     upgrade_id = request.form.get('upgrade_id')
     game_data = load_game_data()
@@ -857,6 +2670,7 @@ def buy_prestige_upgrade():
     
     # Update upgrade level
     game_data['prestige'][upgrade_id] = current_level + 1
+    invalidate_luck(game_data)
     
     # Save game data
     save_game_data(game_data)
@@ -871,6 +2685,7 @@ def buy_prestige_upgrade():
     })
 
 @app.route('/get_prestige_info', methods=['GET'])
+@player_read
 def get_prestige_info():
     game_data = load_game_data()
     
@@ -899,30 +2714,16 @@ def get_prestige_info():
     })
 
 @app.route('/generate_number', methods=['POST'])
+@player_transaction
 def generate_number():
     game_data = load_game_data()
     
-    # Calculate total multiplier from active auras
-    multiplier = calculate_aura_multiplier(game_data['active_auras'])
-    
-    # Apply double luck if owned
-    if game_data['game_passes']['double_luck']:
-        multiplier *= 2
-    
-    # Apply prestige multiplier
-    multiplier *= game_data['prestige']['multiplier']
-    
-    # Apply luck boost from prestige
-    luck_boost_level = game_data['prestige'].get('luck_boost', 0)
-    if luck_boost_level > 0:
-        luck_boost = prestige_upgrades['luck_boost']['effect'] * luck_boost_level
-        multiplier *= (1 + luck_boost)
+    # Total multiplier from auras, passes and prestige, plus the roll distribution
+    multiplier, distribution = get_luck(game_data)
     
     # Generate a random number between 1 and the current limit
-    # Make it harder by using a higher minimum number and a more challenging distribution
     # Use a power distribution to make higher numbers rarer
-    base_number = int(random.uniform(1, game_data['number_limit'] ** 0.7) ** (1/0.7))
-    boosted_number = int(base_number * multiplier)
+    base_number = distribution.sample()
     
     # Update stats
     game_data['stats']['total_rolls'] += 1
@@ -962,17 +2763,13 @@ def generate_number():
     # Check for new achievements
     new_achievements = check_achievements(game_data)
     
-    # Save game data
-    save_game_data(game_data)
-    
     # Check if triple generate is active
     if game_data['game_passes']['triple_generate']:
         # Generate two more numbers
         results = []
         for _ in range(2):
             # Use the same power distribution for additional rolls
-            base_number = int(random.uniform(1, game_data['number_limit'] ** 0.7) ** (1/0.7))
-            boosted_number = int(base_number * multiplier)
+            base_number = distribution.sample()
             
             # Update stats
             game_data['stats']['total_rolls'] += 1
@@ -1009,18 +2806,21 @@ def generate_number():
                 coins_earned += game_data['target_numbers']['rewards']['hard']
             
             results.append({
-                'base_probability': 1 / base_number,
-                'boosted_probability': 1 / boosted_number,
+                'base_probability': distribution.tail(base_number),
+                'boosted_probability': distribution.tail(base_number) / multiplier,
                 'target_rewards': target_rewards
             })
         
-        # Save game data again after all rolls
+        metrics.inc('rolls_total', 3, source='generate_number')
+        metrics.inc('coins_minted_total', coins_earned, source='generate_number')
+        
+        # Save game data after all rolls
         save_game_data(game_data)
         
         return jsonify({
             'success': True,
-            'base_probability': 1 / base_number,
-            'boosted_probability': 1 / boosted_number,
+            'base_probability': distribution.tail(base_number),
+            'boosted_probability': distribution.tail(base_number) / multiplier,
             'multiplier': multiplier,
             'stats': game_data['stats'],
             'coins_earned': coins_earned,
@@ -1031,10 +2831,16 @@ def generate_number():
             'target_rewards': target_rewards
         })
     
+    metrics.inc('rolls_total', source='generate_number')
+    metrics.inc('coins_minted_total', coins_earned, source='generate_number')
+    
+    # Save game data
+    save_game_data(game_data)
+    
     return jsonify({
         'success': True,
-        'base_probability': 1 / base_number,
-        'boosted_probability': 1 / boosted_number,
+        'base_probability': distribution.tail(base_number),
+        'boosted_probability': distribution.tail(base_number) / multiplier,
         'multiplier': multiplier,
         'stats': game_data['stats'],
         'coins_earned': coins_earned,
@@ -1044,7 +2850,29 @@ def generate_number():
         'target_rewards': target_rewards
     })
 
+@app.route('/generate_number_batch', methods=['POST'])
+@player_transaction
+def generate_number_batch():
+    game_data = load_game_data()
+    count = request.values.get('n', 1, type=int)
+    
+    if count is None or count < 1 or count > MAX_BATCH_ROLLS:
+        return jsonify({'success': False, 'message': f'You can generate between 1 and {MAX_BATCH_ROLLS:,} numbers at once.'})
+    
+    result = apply_roll_batch(game_data, count)
+    
+    # Save game data
+    save_game_data(game_data)
+    
+    result.update({
+        'success': True,
+        'stats': game_data['stats'],
+        'new_balance': game_data['coins']
+    })
+    return jsonify(result)
+
 @app.route('/reroll', methods=['POST'])
+@player_transaction
 def reroll():
     game_data = load_game_data()
     
@@ -1059,25 +2887,11 @@ def reroll():
     # Deduct coins
     game_data['coins'] -= 5000  # Increased from 500 to 5000
     
-    # Calculate total multiplier from active auras
-    multiplier = calculate_aura_multiplier(game_data['active_auras'])
-    
-    # Apply double luck if owned
-    if game_data['game_passes']['double_luck']:
-        multiplier *= 2
-    
-    # Apply prestige multiplier
-    multiplier *= game_data['prestige']['multiplier']
-    
-    # Apply luck boost from prestige
-    luck_boost_level = game_data['prestige'].get('luck_boost', 0)
-    if luck_boost_level > 0:
-        luck_boost = prestige_upgrades['luck_boost']['effect'] * luck_boost_level
-        multiplier *= (1 + luck_boost)
+    # Total multiplier from auras, passes and prestige, plus the roll distribution
+    multiplier, distribution = get_luck(game_data)
     
     # Generate a new number using the same challenging distribution
-    base_number = int(random.uniform(1, game_data['number_limit'] ** 0.7) ** (1/0.7))
-    boosted_number = int(base_number * multiplier)
+    base_number = distribution.sample()
     
     # Calculate improvement
     improvement = 0
@@ -1088,14 +2902,15 @@ def reroll():
     # Update stats
     game_data['stats']['total_rolls'] += 1
     game_data['stats']['total_numbers'] += base_number
+    metrics.inc('rolls_total', source='reroll')
     
     # Save game data
     save_game_data(game_data)
     
     return jsonify({
         'success': True,
-        'base_probability': 1 / base_number,
-        'boosted_probability': 1 / boosted_number,
+        'base_probability': distribution.tail(base_number),
+        'boosted_probability': distribution.tail(base_number) / multiplier,
         'multiplier': multiplier,
         'stats': game_data['stats'],
         'improvement': improvement,
@@ -1103,6 +2918,7 @@ def reroll():
     })
 
 @app.route('/check_achievements', methods=['POST'])
+@player_transaction
 def check_achievements_route():
     game_data = load_game_data()
     new_achievements = check_achievements(game_data)
@@ -1126,12 +2942,15 @@ def check_achievements_route():
     return jsonify({'success': False, 'message': 'No new achievements unlocked.'})
 
 @app.route('/get_achievements', methods=['GET'])
+@player_read
 def get_achievements():
     game_data = load_game_data()
     
+    mask = achievement_progress(game_data)['mask']
+    
     all_achievements = []
     for achievement_id, achievement in achievements.items():
-        unlocked = achievement_id in game_data['achievements']['unlocked']
+        unlocked = bool(mask & achievement_bits[achievement_id])
         all_achievements.append({
             'id': achievement_id,
             'name': achievement['name'],
@@ -1147,6 +2966,7 @@ def get_achievements():
     })
 
 @app.route('/get_daily_reward_status')
+@player_read
 def get_daily_reward_status():
     game_data = load_game_data()
     last_claim = game_data['daily_rewards']['last_claim']
@@ -1156,7 +2976,7 @@ def get_daily_reward_status():
     can_claim = True
     if last_claim:
         last_claim_date = datetime.strptime(last_claim, '%Y-%m-%d').date()
-        today = datetime.now().date()
+        today = datetime.fromtimestamp(game_time()).date()
         
         if last_claim_date == today:
             can_claim = False
@@ -1170,11 +2990,12 @@ def get_daily_reward_status():
     })
 
 @app.route('/claim_daily_reward', methods=['POST'])
+@player_transaction
 def claim_daily_reward():
     game_data = load_game_data()
     last_claim = game_data['daily_rewards']['last_claim']
     streak = game_data['daily_rewards']['streak']
-    today = datetime.now().date()
+    today = datetime.fromtimestamp(game_time()).date()
     
     # Check if already claimed today
     if last_claim:
@@ -1195,6 +3016,7 @@ def claim_daily_reward():
     
     # Add coins
     game_data['coins'] += reward['coins']
+    metrics.inc('coins_minted_total', reward['coins'], source='daily_reward')
     game_data['daily_rewards']['last_claim'] = today.strftime('%Y-%m-%d')
     game_data['daily_rewards']['streak'] = streak
     
@@ -1213,6 +3035,7 @@ def claim_daily_reward():
     })
 
 @app.route('/buy_coins', methods=['POST'])
+@player_transaction
 def buy_coins():
     game_data = load_game_data()
     amount = request.form.get('amount', type=int)
@@ -1223,6 +3046,7 @@ def buy_coins():
     # In a real application, you would integrate with a payment processor here
     # For now, we'll just add the coins directly
     game_data['coins'] += amount
+    metrics.inc('coins_minted_total', amount, source='purchase')
     
     if not save_game_data(game_data):
         return jsonify({'success': False, 'message': 'Error saving game data!'})
@@ -1234,27 +3058,147 @@ def buy_coins():
     })
 
 @app.route('/items')
+@player_read
 def items():
     game_data = load_game_data()
-    return render_template('items.html', game_data=game_data)
+    return render_template('items.html', game_data=game_data, inventory_items=inventory_items(game_data))
+
+# Global market: item supply is shared by every player. The price of an item
+# follows its supply curve, price(s) = base_price * sqrt(initial_supply / s),
+# so buying q units at supply s costs the integral of the curve from s - q to
+# s, which has the closed form
+#     base_price * sqrt(initial_supply) * 2 * (sqrt(s) - sqrt(s - q))
+# and the quoted price is the cost of the next single unit.
+def market_cost(item_id, supply, quantity):
+    item = game_items[item_id]
+    return math.ceil(item['base_price'] * math.sqrt(item['initial_supply']) * 2 * (math.sqrt(supply) - math.sqrt(supply - quantity)))
+
+def market_price(item_id, supply):
+    return market_cost(item_id, supply, 1) if supply >= 1 else None
+
+# Buy orders are queued and applied in batches: whichever request gets the
+# market lock applies every order queued so far, with one load and one save of
+# the market state, and the requests whose orders it filled just pick up
+# their results.
+#
+# The market state carries a version that goes up with every batch that
+# trades. /get_market_info bodies are cached pre-serialized per market version
+# and owned counts, and served with an ETag so polling clients get a 304.
+class Market:
+    def __init__(self):
+        self.lock = threading.Lock()  # held while a batch is applied
+        self.queue_lock = threading.Lock()
+        self.pending = []
+        self.info_cache = {}  # (market version, owned counts) -> (body, etag)
+
+    def state(self):
+        # The saved market state ({'version', 'supply': item_id -> supply}),
+        # with its store version
+        state, version = state_cache.get(MARKET_STATE_ID)
+        if state is None:
+            state = {'version': 0, 'supply': {}}
+        elif 'supply' not in state:
+            # Markets saved before versioning were a bare item_id -> supply map;
+            # the converted record is written back by the next trade
+            state = {'version': 0, 'supply': dict(state)}
+        for item_id, item in game_items.items():
+            state['supply'].setdefault(item_id, item['initial_supply'])
+        return state, version
+
+    def info(self, game_data):
+        # (JSON body, ETag) of the player's /get_market_info response
+        state = self.state()[0]
+        owned = tuple(game_data['inventory'].get(item_id, 0) for item_id in game_items)
+        key = (state['version'], owned)
+        cached = self.info_cache.get(key)
+        if cached is None:
+            market_info = {item_id: market_entry(item_id, state['supply'][item_id], game_data) for item_id in game_items}
+            body = app.json.dumps({'success': True, 'market_version': state['version'], 'market_info': market_info})
+            cached = (body, f"{state['version']}-{hashlib.sha1(body.encode()).hexdigest()[:16]}")
+            if len(self.info_cache) >= MARKET_INFO_CACHE_SIZE:
+                self.info_cache.clear()
+            self.info_cache[key] = cached
+        return cached
+
+    def buy(self, item_id, quantity, budget):
+        # Returns the order with 'cost' set if it was filled, or 'error' if not
+        return self.submit({'item_id': item_id, 'quantity': quantity, 'budget': budget})
+
+    def refund(self, item_id, quantity):
+        # Put a filled order's units back (the buyer's save didn't go through)
+        return self.submit({'item_id': item_id, 'quantity': -quantity, 'budget': None})
+
+    def submit(self, order):
+        order['done'] = False
+        with self.queue_lock:
+            self.pending.append(order)
+        with self.lock:
+            if not order['done']:
+                with self.queue_lock:
+                    batch = self.pending
+                    self.pending = []
+                self.apply(batch)
+        return order
+
+    def apply(self, batch):
+        for attempt in range(STATE_MAX_RETRIES):
+            state, version = self.state()
+            supplies = dict(state['supply'])
+            for order in batch:
+                order['cost'] = order['error'] = None
+                item_id, quantity = order['item_id'], order['quantity']
+                supply = supplies[item_id]
+                if quantity < 0:
+                    supplies[item_id] = supply - quantity
+                    continue
+                if supply < quantity:
+                    order['error'] = 'Not enough supply'
+                    continue
+                cost = market_cost(item_id, supply, quantity)
+                if cost > order['budget']:
+                    order['error'] = 'Not enough coins'
+                    continue
+                supplies[item_id] = supply - quantity
+                order['cost'] = cost
+            if supplies == state['supply']:
+                break
+            try:
+                state_cache.put(MARKET_STATE_ID, {'version': state['version'] + 1, 'supply': supplies}, 'market', version)
+                self.info_cache.clear()
+                break
+            except StateConflict:
+                # Another worker traded in between: redo the batch on its state
+                state_cache.invalidate(MARKET_STATE_ID)
+        else:
+            for order in batch:
+                order['cost'], order['error'] = None, 'The market is busy, please try again!'
+        for order in batch:
+            order['done'] = True
+
+market = Market()
+
+def market_entry(item_id, supply, game_data):
+    item = game_items[item_id]
+    return {
+        'name': item['name'],
+        'description': item['description'],
+        'icon': item['icon'],
+        'price': market_price(item_id, supply),
+        'supply': supply,
+        'owned': game_data['inventory'].get(item_id, 0)
+    }
 
 @app.route('/get_market_info')
+@player_read
 def get_market_info():
     game_data = load_game_data()
-    market_info = {}
-    for item_id, item in game_items.items():
-        market_data = game_data['market'][item_id]
-        market_info[item_id] = {
-            'name': item['name'],
-            'description': item['description'],
-            'icon': item['icon'],
-            'price': market_data['price'],
-            'supply': market_data['supply'],
-            'owned': game_data['inventory'].get(item_id, 0)
-        }
-    return jsonify({'success': True, 'market_info': market_info})
+    body, etag = market.info(game_data)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 @app.route('/buy_item', methods=['POST'])
+@player_transaction
 def buy_item():
     game_data = load_game_data()
     item_id = request.form.get('item_id')
@@ -1262,49 +3206,36 @@ def buy_item():
     
     if item_id not in game_items:
         return jsonify({'success': False, 'message': 'Invalid item'})
+    if quantity <= 0:
+        return jsonify({'success': False, 'message': 'Invalid quantity'})
     
-    market_data = game_data['market'][item_id]
-    total_cost = market_data['price'] * quantity
-    
-    if game_data['coins'] < total_cost:
-        return jsonify({'success': False, 'message': 'Not enough coins'})
-    
-    if market_data['supply'] < quantity:
-        return jsonify({'success': False, 'message': 'Not enough supply'})
+    # Price the whole order on the supply curve; the market checks the budget
+    order = market.buy(item_id, quantity, game_data['coins'])
+    if order['error']:
+        return jsonify({'success': False, 'message': order['error']})
     
     # Update coins and inventory
-    game_data['coins'] -= total_cost
+    game_data['coins'] -= order['cost']
     game_data['inventory'][item_id] = game_data['inventory'].get(item_id, 0) + quantity
-    market_data['supply'] -= quantity
-    
-    # Update price based on supply and demand
-    supply_ratio = market_data['supply'] / game_items[item_id]['initial_supply']
-    price_multiplier = 1 / (supply_ratio ** 0.5)  # Price increases as supply decreases
-    market_data['price'] = int(game_items[item_id]['base_price'] * price_multiplier)
     
-    save_game_data(game_data)
-    
-    # Get updated market info
-    market_info = {}
-    for item_id, item in game_items.items():
-        market_data = game_data['market'][item_id]
-        market_info[item_id] = {
-            'name': item['name'],
-            'description': item['description'],
-            'icon': item['icon'],
-            'price': market_data['price'],
-            'supply': market_data['supply'],
-            'owned': game_data['inventory'].get(item_id, 0)
-        }
+    try:
+        save_game_data(game_data)
+    except StateConflict:
+        # The purchase is retried on the fresh state, so give the units back
+        market.refund(item_id, quantity)
+        raise
     
+    # The traded item's new market entry
+    supply = market.state()[0]['supply'][item_id]
     return jsonify({
         'success': True,
-        'message': f'Successfully purchased {quantity} {game_items[item_id]["name"]}(s)',
+        'message': f'Successfully purchased {quantity} {game_items[item_id]["name"]}(s) for {order["cost"]:,} coins',
         'new_balance': game_data['coins'],
-        'new_market': market_info
+        'new_market': {item_id: market_entry(item_id, supply, game_data)}
     })
 
 @app.route('/gamble', methods=['POST'])
+@player_transaction
 def gamble():
     game_data = load_game_data()
     bet_amount = int(request.form.get('bet_amount', 0))
@@ -1315,32 +3246,28 @@ def gamble():
         return jsonify({'success': False, 'message': 'Invalid bet amount'})
     
     # Parse target range (e.g., "1-100", "1000-2000")
-    try:
-        min_val, max_val = map(int, target_range.split('-'))
-        if min_val >= max_val:
-            return jsonify({'success': False, 'message': 'Invalid range'})
-    except:
-        return jsonify({'success': False, 'message': 'Invalid range format'})
+    bet_range = parse_gamble_range(target_range, game_data['number_limit'])
+    if bet_range is None:
+        return jsonify({'success': False, 'message': f'Invalid range, use min-max within 1-{game_data["number_limit"]:,}'})
+    min_val, max_val = bet_range
+    
+    # Payout from the exact chance of rolling into the range (higher risk = higher reward)
+    probability, payout_multiplier = gamble_odds(game_data['number_limit'], min_val, max_val)
+    if probability <= 0:
+        return jsonify({'success': False, 'message': 'That range can never be rolled'})
     
     # Generate a number
-    base_number = int(random.uniform(1, game_data['number_limit'] ** 0.7) ** (1/0.7))
+    base_number = get_luck(game_data)[1].sample()
+    metrics.inc('rolls_total', source='gamble')
     
     # Check if player won
     won = min_val <= base_number <= max_val
     
-    # Calculate payout (higher risk = higher reward)
-    range_size = max_val - min_val
-    total_range = game_data['number_limit']
-    probability = range_size / total_range
-    payout_multiplier = 1 / probability  # Inverse of probability
-    
-    # Cap the multiplier to prevent excessive rewards
-    payout_multiplier = min(payout_multiplier, 100)
-    
     # Update coins
     if won:
         winnings = int(bet_amount * payout_multiplier)
         game_data['coins'] += winnings - bet_amount
+        metrics.inc('coins_minted_total', winnings - bet_amount, source='gamble')
         message = f'You won {winnings - bet_amount} coins!'
     else:
         game_data['coins'] -= bet_amount
@@ -1353,49 +3280,129 @@ def gamble():
         'success': True,
         'message': message,
         'number': base_number,
+        'probability': float(probability),
+        'payout_multiplier': float(payout_multiplier),
+        'new_balance': game_data['coins']
+    })
+
+@app.route('/gamble_batch', methods=['POST'])
+@player_transaction
+def gamble_batch():
+    # Many bets in one go: bets is a list of {bet_amount, target_range}, sent
+    # as JSON or as a JSON-encoded form field
+    game_data = load_game_data()
+    payload = request.get_json(silent=True) or {}
+    bets = payload.get('bets')
+    if bets is None:
+        try:
+            bets = json.loads(request.form.get('bets', '[]'))
+        except ValueError:
+            bets = None
+    
+    if not isinstance(bets, list) or not 1 <= len(bets) <= MAX_BATCH_BETS:
+        return jsonify({'success': False, 'message': f'You can place between 1 and {MAX_BATCH_BETS:,} bets at once.'})
+    
+    amounts = []
+    ranges = []
+    for bet in bets:
+        try:
+            bet_amount = int(bet.get('bet_amount', 0))
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Invalid bet'})
+        bet_range = parse_gamble_range(str(bet.get('target_range', '')), game_data['number_limit'])
+        if bet_amount <= 0:
+            return jsonify({'success': False, 'message': 'Invalid bet amount'})
+        if bet_range is None:
+            return jsonify({'success': False, 'message': f'Invalid range, use min-max within 1-{game_data["number_limit"]:,}'})
+        amounts.append(bet_amount)
+        ranges.append(bet_range)
+    
+    # Every bet is staked up front
+    if sum(amounts) > game_data['coins']:
+        return jsonify({'success': False, 'message': 'Not enough coins for all of these bets'})
+    
+    amounts = np.array(amounts, dtype=np.int64)
+    min_vals, max_vals = np.array(ranges, dtype=np.int64).T
+    probabilities, payout_multipliers = gamble_odds(game_data['number_limit'], min_vals, max_vals)
+    if not np.all(probabilities > 0):
+        return jsonify({'success': False, 'message': 'That range can never be rolled'})
+    
+    # One draw for all bets, one balance update
+    numbers = get_luck(game_data)[1].sample_many(len(bets))
+    won = (min_vals <= numbers) & (numbers <= max_vals)
+    net = np.where(won, (amounts * payout_multipliers).astype(np.int64) - amounts, -amounts)
+    total_net = int(net.sum())
+    game_data['coins'] += total_net
+    metrics.inc('rolls_total', len(bets), source='gamble')
+    metrics.inc('coins_minted_total', int(net[won].sum()), source='gamble')
+    
+    # Save game data
+    save_game_data(game_data)
+    
+    return jsonify({
+        'success': True,
+        'message': f'You won {total_net} coins!' if total_net >= 0 else f'You lost {-total_net} coins!',
+        'results': [
+            {'number': int(number), 'won': bool(hit), 'net': int(change), 'probability': float(probability)}
+            for number, hit, change, probability in zip(numbers, won, net, probabilities)
+        ],
+        'wins': int(won.sum()),
+        'net': total_net,
         'new_balance': game_data['coins']
     })
 
 @app.route('/gamble')
+@player_read
 def gamble_page():
     game_data = load_game_data()
     return render_template('gamble.html', game_data=game_data)
 
+def leaderboard_page_args():
+    sort = request.args.get('sort', 'coins')
+    if sort not in LeaderboardIndex.keys:
+        sort = 'coins'
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+    per_page = min(max(request.args.get('per_page', LEADERBOARD_PAGE_SIZE, type=int) or 1, 1), 100)
+    return sort, page, per_page
+
+def leaderboard_page(sort, page, per_page):
+    if STATE_SHARED:
+        leaderboard_index.maybe_sync(state_store)
+    player_id = current_player_id()
+    entries = leaderboard_index.page(sort, (page - 1) * per_page, per_page)
+    for entry in entries:
+        if entry.pop('id') == player_id:
+            entry['name'] = 'You'
+    return entries, leaderboard_index.rank(sort, player_id)
+
 @app.route('/leaderboard')
+@player_read
 def leaderboard():
-    # Combine real player data with bot data
     game_data = load_game_data()
-    
-    # Create player entry
-    player_entry = {
-        'name': 'You',
-        'coins': game_data['coins'],
-        'best_number': game_data['stats']['best_number'],
-        'total_rolls': game_data['stats']['total_rolls']
-    }
-    
-    # Create leaderboard entries
-    leaderboard_entries = []
-    
-    # Add player
-    leaderboard_entries.append(player_entry)
-    
-    # Add bots
-    for bot in bots:
-        if bot.active:
-            leaderboard_entries.append({
-                'name': bot.name,
-                'coins': bot.coins,
-                'best_number': bot.best_number,
-                'total_rolls': bot.total_rolls
-            })
-    
-    # Sort by coins (descending)
-    leaderboard_entries.sort(key=lambda x: x['coins'], reverse=True)
+    sort, page, per_page = leaderboard_page_args()
+    leaderboard_entries, my_rank = leaderboard_page(sort, page, per_page)
     
     return render_template('leaderboard.html', 
                          leaderboard=leaderboard_entries,
-                         game_data=game_data)
+                         game_data=game_data,
+                         sort=sort,
+                         page=page,
+                         per_page=per_page,
+                         my_rank=my_rank,
+                         total_players=len(leaderboard_index))
+
+@app.route('/get_leaderboard')
+def get_leaderboard():
+    sort, page, per_page = leaderboard_page_args()
+    leaderboard_entries, my_rank = leaderboard_page(sort, page, per_page)
+    return jsonify({
+        'success': True,
+        'sort': sort,
+        'page': page,
+        'leaderboard': leaderboard_entries,
+        'my_rank': my_rank,
+        'total_players': len(leaderboard_index)
+    })
 
 # Item rarity definitions
 item_rarities = {
@@ -1453,74 +3460,153 @@ items_by_rarity = {
     ]
 }
 
+# Catalog lookup by (rarity, item name)
+item_catalog = {
+    (rarity, item['name']): item
+    for rarity, items in items_by_rarity.items()
+    for item in items
+}
+
+def count_inventory_items(items):
+    # Inventories used to hold one item dict per pull; fold them into counts
+    counts = {}
+    for item in items:
+        counts[item['name']] = counts.get(item['name'], 0) + 1
+    return counts
+
+def inventory_items(game_data):
+    # Expand the inventory counts into item details for display
+    expanded = []
+    for rarity in item_rarities:
+        for item_name, count in game_data['inventory'].get(rarity, {}).items():
+            if count <= 0:
+                continue
+            item = item_catalog.get((rarity, item_name), {'name': item_name, 'value': 0, 'icon': ''})
+            expanded.append(dict(item, rarity=rarity, color=item_rarities[rarity]['color'], count=count))
+    return expanded
+
+# Walker alias table: after O(n) setup, draws from a fixed discrete
+# distribution in O(1) with one bucket pick and one biased coin flip
+class AliasTable:
+    def __init__(self, weights):
+        count = len(weights)
+        total = sum(weights)
+        scaled = [weight * count / total for weight in weights]
+        self.prob = [1.0] * count
+        self.alias = list(range(count))
+        
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        
+        self.prob_array = np.array(self.prob)
+        self.alias_array = np.array(self.alias)
+
+    def sample(self):
+        # One uniform picks the bucket and, from its fractional part, the coin
+        # flip; the tables are small enough that plenty of bits are left over
+        u = rng.random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def sample_many(self, count):
+        buckets = rng.generator.integers(0, len(self.prob), count)
+        flips = rng.generator.random(count)
+        return np.where(flips < self.prob_array[buckets], buckets, self.alias_array[buckets])
+
+# Every (rarity, item) outcome of opening a pack, with its chance
+item_outcomes = [
+    (rarity, item)
+    for rarity, items in items_by_rarity.items()
+    for item in items
+]
+item_sampler = AliasTable([
+    item_rarities[rarity]['chance'] / len(items_by_rarity[rarity])
+    for rarity, item in item_outcomes
+])
+
+def item_outcome(index):
+    # A fresh dict with rarity and color information; the catalog stays untouched
+    rarity, item = item_outcomes[index]
+    return dict(item, rarity=rarity, color=item_rarities[rarity]['color'])
+
 def get_random_item():
-    # Roll for rarity
-    roll = random.randint(1, 100)
-    current_chance = 0
-    selected_rarity = None
-    
-    for rarity, data in item_rarities.items():
-        current_chance += data['chance']
-        if roll <= current_chance:
-            selected_rarity = rarity
-            break
-    
-    # Get random item from selected rarity
-    items = items_by_rarity[selected_rarity]
-    item = random.choice(items)
-    
-    # Add rarity and color information to the item
-    item['rarity'] = selected_rarity
-    item['color'] = item_rarities[selected_rarity]['color']
-    
-    return item
+    return item_outcome(item_sampler.sample())
 
 @app.route('/generate', methods=['POST'])
+@player_transaction
 def generate():
     game_data = load_game_data()
+    count = request.values.get('count', 1, type=int)
+    
+    if count is None or count < 1 or count > MAX_PACK_OPENS:
+        return jsonify({'success': False, 'error': f'You can generate between 1 and {MAX_PACK_OPENS:,} items at once.'})
     
     # Check if player has enough coins
-    if game_data['coins'] < 100:  # Increased from 10 to 100
-        return jsonify({'success': False, 'error': 'Not enough coins! You need 100 coins to generate an item.'})
+    cost = 100 * count  # Increased from 10 to 100 per item
+    if game_data['coins'] < cost:
+        return jsonify({'success': False, 'error': f'Not enough coins! You need {cost:,} coins to generate {count} item(s).'})
     
     # Deduct coins
-    game_data['coins'] -= 100  # Increased from 10 to 100
-    
-    # Get a random item
-    item = get_random_item()
+    game_data['coins'] -= cost
     
-    # Add item to inventory
-    if item['rarity'] not in game_data['inventory']:
-        game_data['inventory'][item['rarity']] = []
-    game_data['inventory'][item['rarity']].append(item)
+    # Draw all items at once and tally them per outcome
+    if count == 1:
+        pulls = {item_sampler.sample(): 1}
+    else:
+        tally = np.bincount(item_sampler.sample_many(count), minlength=len(item_outcomes))
+        pulls = {int(index): int(tally[index]) for index in np.flatnonzero(tally)}
+    
+    # Add items to inventory
+    items = []
+    for index, pulled in pulls.items():
+        item = item_outcome(index)
+        rarity_counts = game_data['inventory'].setdefault(item['rarity'], {})
+        rarity_counts[item['name']] = rarity_counts.get(item['name'], 0) + pulled
+        metrics.inc('items_generated_total', pulled, rarity=item['rarity'])
+        item['count'] = pulled
+        items.append(item)
     
     # Update stats
-    game_data['stats']['total_rolls'] += 1
+    game_data['stats']['total_rolls'] += count
     
     # Save game data
     save_game_data(game_data)
     
     return jsonify({
         'success': True,
-        'item': item,
+        'item': items[0] if count == 1 else None,
+        'items': items,
         'new_balance': game_data['coins'],
         'stats': game_data['stats']
     })
 
 @app.route('/trade')
+@player_read
 def trade_page():
     game_data = load_game_data()
-    return render_template('trade.html', game_data=game_data)
+    return render_template('trade.html', game_data=game_data, inventory_items=inventory_items(game_data))
 
 @app.route('/get_inventory', methods=['GET'])
+@player_read
 def get_inventory():
     game_data = load_game_data()
     return jsonify({
         'success': True,
-        'inventory': game_data['inventory']
+        'inventory': game_data['inventory'],
+        'items': inventory_items(game_data)
     })
 
 @app.route('/trade_item', methods=['POST'])
+@player_transaction
 def trade_item():
     game_data = load_game_data()
     
@@ -1532,41 +3618,31 @@ def trade_item():
         return jsonify({'success': False, 'error': 'Invalid trade parameters'})
     
     # Check if the item exists in the inventory
-    if rarity not in game_data['inventory']:
+    if rarity not in item_rarities or rarity not in game_data['inventory']:
         return jsonify({'success': False, 'error': 'Item not found in inventory'})
     
     # Count how many of this item the player has
-    item_count = 0
-    for item in game_data['inventory'][rarity]:
-        if item['name'] == item_name:
-            item_count += 1
+    rarity_counts = game_data['inventory'][rarity]
+    item_count = rarity_counts.get(item_name, 0)
     
     if item_count < amount:
         return jsonify({'success': False, 'error': f'You only have {item_count} of this item, not {amount}'})
     
     # Remove the items from inventory
-    items_to_remove = amount
-    new_inventory = []
-    
-    for item in game_data['inventory'][rarity]:
-        if items_to_remove > 0 and item['name'] == item_name:
-            items_to_remove -= 1
-        else:
-            new_inventory.append(item)
-    
-    game_data['inventory'][rarity] = new_inventory
+    if item_count == amount:
+        del rarity_counts[item_name]
+    else:
+        rarity_counts[item_name] = item_count - amount
     
     # Calculate trade value (50% of item value)
-    item_value = 0
-    for item in items_by_rarity[rarity]:
-        if item['name'] == item_name:
-            item_value = item['value']
-            break
+    item = item_catalog.get((rarity, item_name))
+    item_value = item['value'] if item else 0
     
     trade_value = item_value * amount * 0.5
     
     # Add coins to player's balance
     game_data['coins'] += trade_value
+    metrics.inc('coins_minted_total', trade_value, source='trade')
     
     # Save game data
     save_game_data(game_data)
@@ -1577,6 +3653,16 @@ def trade_item():
         'new_balance': game_data['coins']
     })
 
+# Initialize bot thread when the app is created
+bot_thread = threading.Thread(target=bot_activity_thread)
+bot_thread.daemon = True
+bot_thread.start()
+
+# Start the auto generate scheduler once everything it uses is defined
+auto_generate_scheduler = threading.Thread(target=auto_generate_thread)
+auto_generate_scheduler.daemon = True
+auto_generate_scheduler.start()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port) 
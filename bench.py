@@ -0,0 +1,207 @@
+"""Micro-benchmarks for the game's hot paths.
+
+Times state loading and saving at realistic state sizes, the generate / gamble
+/ trade routes, rolls, achievement checks, item pulls and the leaderboard, and
+compares the results against a saved baseline:
+
+    python bench.py                   # run and compare with bench_baseline.json
+    python bench.py --save-baseline   # run and store the results as the new baseline
+    python bench.py --json            # print the results as JSON
+    python bench.py --check           # exit with status 1 if anything regressed
+
+The app runs on a scratch state database in a temporary directory, so your
+game data is never touched.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import timeit
+
+# Point the app at a scratch database before it opens one, and keep bots and
+# server-side auto generate ticks from running alongside the timings.
+# Registered first, the cleanup runs last at exit, after the app's final flush.
+scratch_dir = tempfile.mkdtemp(prefix='bench-')
+atexit.register(shutil.rmtree, scratch_dir, True)
+os.environ['STATE_BACKEND'] = 'sqlite'
+os.environ['STATE_DB_FILE'] = os.path.join(scratch_dir, 'game_state.db')
+os.environ['BOT_COUNT'] = '0'
+os.environ['AUTO_GENERATE_TICK'] = '1e9'
+
+import app as game
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+BENCH_PLAYER_ID = 'bench'
+
+def make_large_state(aura_count=200, item_count=1000000):
+    # A long-time player: a long list of active auras, every item in the
+    # catalog held many times over and the achievements that go with it
+    game_data = game.default_game_data()
+    game_data['coins'] = 10 ** 12
+    game_data['stats'] = {'total_rolls': 250000, 'best_number': 990000, 'total_numbers': 10 ** 10}
+    for rarity, items in game.items_by_rarity.items():
+        game_data['inventory'][rarity] = {item['name']: item_count for item in items}
+    aura_ids = list(game.auras)
+    for i in range(aura_count):
+        game.activate_aura(game_data, aura_ids[i % len(aura_ids)])
+    game.check_achievements(game_data)
+    return game_data
+
+def fill_leaderboard(index, count):
+    rng = game.np.random.default_rng(0)
+    coins = rng.integers(0, 10 ** 7, count)
+    best = rng.integers(0, 10 ** 6, count)
+    rolls = rng.integers(0, 10 ** 5, count)
+    for i in range(count):
+        index.update(f'player{i}', f'Player {i}', int(coins[i]), int(best[i]), int(rolls[i]))
+
+def set_triple_generate(enabled):
+    def set_pass():
+        game_data = game.load_game_data(BENCH_PLAYER_ID)
+        game_data['game_passes']['triple_generate'] = enabled
+        game.save_game_data(game_data, BENCH_PLAYER_ID)
+    game.run_player_transaction(BENCH_PLAYER_ID, set_pass)
+
+def post(client, path, data=None):
+    def request():
+        response = client.post(path, data=data or {})
+        assert response.status_code == 200, f'{path} returned {response.status_code}'
+    return request
+
+def build_benchmarks(args):
+    # name -> (setup, callable); setups run in order right before their benchmark
+    # The routes play as the benchmark player
+    client = game.app.test_client()
+    with client.session_transaction() as session:
+        session['player_id'] = BENCH_PLAYER_ID
+    large_state = make_large_state(args.auras)
+    payload = game.serialize_state(large_state)
+    trade_item = game.items_by_rarity['common'][0]['name']
+    distribution = game.roll_distribution(large_state['number_limit'])
+
+    def setup_player():
+        game.save_game_data(make_large_state(args.auras), BENCH_PLAYER_ID)
+        game.state_cache.flush()
+
+    def load_cold():
+        game.state_cache.invalidate(BENCH_PLAYER_ID)
+        game.load_game_data(BENCH_PLAYER_ID)
+
+    def build_leaderboard():
+        fill_leaderboard(game.LeaderboardIndex(), args.leaderboard_size)
+
+    def leaderboard_page():
+        response = client.get('/get_leaderboard')
+        assert response.status_code == 200
+
+    return {
+        'serialize_state': (setup_player, lambda: game.serialize_state(large_state)),
+        'deserialize_state': (None, lambda: json.loads(payload)),
+        'load_game_data': (None, lambda: game.load_game_data(BENCH_PLAYER_ID)),
+        'load_game_data_cold': (None, load_cold),
+        'save_game_data': (None, lambda: game.save_game_data(large_state, BENCH_PLAYER_ID)),
+        'state_store_put': (None, lambda: game.state_store.put_many([(BENCH_PLAYER_ID, payload, 'bench')])),
+        'check_achievements': (None, lambda: game.check_achievements(large_state)),
+        'get_random_item': (None, game.get_random_item),
+        'roll_sample': (None, distribution.sample),
+        'roll_sample_many_10k': (None, lambda: distribution.sample_many(10000)),
+        'roll_tail': (None, lambda: distribution.tail(123456)),
+        'generate_number': (lambda: set_triple_generate(False), post(client, '/generate_number')),
+        'generate_number_triple': (lambda: set_triple_generate(True), post(client, '/generate_number')),
+        'generate_item': (None, post(client, '/generate')),
+        'gamble': (None, post(client, '/gamble', {'bet_amount': 1000, 'target_range': '1000-50000'})),
+        'trade_item': (None, post(client, '/trade_item', {'item_name': trade_item, 'rarity': 'common', 'amount': 1})),
+        'leaderboard_build': (None, build_leaderboard),
+        'leaderboard_page': (lambda: fill_leaderboard(game.leaderboard_index, args.leaderboard_size), leaderboard_page)
+    }
+
+def time_benchmark(func, repeat):
+    # Per-call times in microseconds, from `repeat` runs of ~0.2s each
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = [total / number * 1e6 for total in timer.repeat(repeat, number)]
+    return {
+        'median_us': statistics.median(runs),
+        'min_us': min(runs),
+        'ops_per_sec': 1e6 / statistics.median(runs),
+        'calls': number * repeat
+    }
+
+def run(args):
+    benchmarks = build_benchmarks(args)
+    selected = args.only.split(',') if args.only else list(benchmarks)
+    results = {}
+    for name, (setup, func) in benchmarks.items():
+        if setup is not None:
+            setup()
+        if name not in selected:
+            continue
+        results[name] = time_benchmark(func, args.repeat)
+        if not args.json:
+            print(f'{name:<26}{results[name]["median_us"]:>12.2f} us', file=sys.stderr)
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'auras': args.auras,
+        'leaderboard_size': args.leaderboard_size,
+        'results': results
+    }
+
+def compare(report, baseline, tolerance, out=sys.stdout):
+    # Returns the names of the benchmarks that got slower than the tolerance allows
+    regressions = []
+    print(f"{'benchmark':<26}{'baseline us':>14}{'current us':>14}{'change':>10}", file=out)
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<26}{'-':>14}{result['median_us']:>14.2f}{'new':>10}", file=out)
+            continue
+        change = result['median_us'] / base['median_us'] - 1
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<26}{base['median_us']:>14.2f}{result['median_us']:>14.2f}{change:>+10.1%}{flag}", file=out)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the game\'s hot paths against a saved baseline.')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark')
+    parser.add_argument('--auras', type=int, default=200, help='active auras in the benchmark state')
+    parser.add_argument('--leaderboard-size', type=int, default=10000, help='players on the benchmark leaderboard')
+    parser.add_argument('--only', help='comma separated benchmarks to run')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline file to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='slowdown allowed before flagging a regression')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 if any benchmark regressed')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=4))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+            f.write('\n')
+        print(f'Saved baseline to {args.baseline}', file=sys.stderr)
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; run with --save-baseline to create one', file=sys.stderr)
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    # With --json the comparison goes to stderr, keeping stdout parseable
+    regressions = compare(report, baseline, args.tolerance, sys.stderr if args.json else sys.stdout)
+    if regressions and args.check:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
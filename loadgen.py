@@ -0,0 +1,195 @@
+"""Load generator for the Lucky Number Generator.
+
+Runs N simulated players against the game's routes, each picking actions from
+a weighted mix (by default the bots' generate / gamble / buy_item mix plus item
+packs, trading and the leaderboard), and reports throughput and p50/p95/p99
+latency per route.
+
+    python loadgen.py --players 20 --duration 30
+    python loadgen.py --mix generate_number=5,gamble=1,leaderboard=1
+    python loadgen.py --url http://localhost:5000 --players 50
+
+Without --url the app is driven in-process through Flask's test client, on a
+scratch state database in a temporary directory, so your game data is never
+touched.
+"""
+import argparse
+import atexit
+import http.cookiejar
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Point the app at a scratch database before it opens one, and keep bots and
+# server-side auto generate ticks from adding load of their own. Registered
+# first, the cleanup runs last at exit, after the app's final flush.
+scratch_dir = tempfile.mkdtemp(prefix='loadgen-')
+atexit.register(shutil.rmtree, scratch_dir, True)
+os.environ['STATE_BACKEND'] = 'sqlite'
+os.environ['STATE_DB_FILE'] = os.path.join(scratch_dir, 'game_state.db')
+os.environ['BOT_COUNT'] = '0'
+os.environ['AUTO_GENERATE_TICK'] = '1e9'
+
+from app import BOT_ACTIVITIES, game_items, items_by_rarity, percentile
+
+# Route each bot activity maps to
+bot_activity_routes = {
+    'generate': 'generate_number',
+    'gamble': 'gamble',
+    'buy_item': 'buy_item'
+}
+
+# The bots' activity mix, plus the routes bots don't use
+default_mix = dict({bot_activity_routes[activity]: 1.0 for activity in BOT_ACTIVITIES}, generate=0.5, trade_item=0.25, leaderboard=0.25)
+
+def random_range():
+    low = random.randint(1, 100000)
+    return f'{low}-{low + random.randint(100, 10000)}'
+
+def random_trade():
+    rarity = random.choice(['common', 'rare'])
+    return {'item_name': random.choice(items_by_rarity[rarity])['name'], 'rarity': rarity, 'amount': 1}
+
+# Route name -> (method, path, form data factory)
+actions = {
+    'generate_number': ('POST', '/generate_number', lambda: {}),
+    'gamble': ('POST', '/gamble', lambda: {'bet_amount': random.randint(100, 1000), 'target_range': random_range()}),
+    'buy_item': ('POST', '/buy_item', lambda: {'item_id': random.choice(list(game_items)), 'quantity': 1}),
+    'generate': ('POST', '/generate', lambda: {}),
+    'trade_item': ('POST', '/trade_item', random_trade),
+    'leaderboard': ('GET', '/get_leaderboard', lambda: {})
+}
+
+class TestClientPlayer:
+    # A player driving the app in-process; each has its own session cookie
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, data):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code
+
+class HTTPPlayer:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, data):
+        body = urllib.parse.urlencode(data).encode() if method == 'POST' else None
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + path, data=body, method=method)) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        route, weight = part.split('=')
+        if route not in actions:
+            raise argparse.ArgumentTypeError(f'Unknown route {route!r}, choose from {", ".join(actions)}')
+        mix[route] = float(weight)
+    return mix
+
+def run_player(player, mix, deadline, think_time, results, lock):
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    latencies = {route: [] for route in routes}
+    errors = {route: 0 for route in routes}
+
+    while time.perf_counter() < deadline:
+        route = random.choices(routes, weights)[0]
+        method, path, make_data = actions[route]
+        start = time.perf_counter()
+        try:
+            status = player.request(method, path, make_data())
+        except Exception:
+            status = None
+        latencies[route].append(time.perf_counter() - start)
+        if status is None or status >= 400:
+            errors[route] += 1
+        if think_time:
+            time.sleep(random.uniform(0, 2 * think_time))
+
+    with lock:
+        for route in routes:
+            results['latencies'][route].extend(latencies[route])
+            results['errors'][route] += errors[route]
+
+def run(players, mix, duration, think_time=0.0, url=None, warmup_purchases=4):
+    if url:
+        clients = [HTTPPlayer(url) for _ in range(players)]
+    else:
+        from app import app as flask_app
+        clients = [TestClientPlayer(flask_app) for _ in range(players)]
+
+    # Give every player some coins to gamble and shop with
+    for client in clients:
+        for _ in range(warmup_purchases):
+            client.request('POST', '/buy_coins', {'amount': 250000})
+
+    results = {'latencies': {route: [] for route in mix}, 'errors': {route: 0 for route in mix}}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [
+        threading.Thread(target=run_player, args=(client, mix, deadline, think_time, results, lock))
+        for client in clients
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = {'players': players, 'duration': elapsed, 'routes': {}}
+    total = 0
+    for route in mix:
+        latencies = sorted(results['latencies'][route])
+        total += len(latencies)
+        report['routes'][route] = {
+            'requests': len(latencies),
+            'errors': results['errors'][route],
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000
+        }
+    report['requests'] = total
+    report['throughput'] = total / elapsed
+    return report
+
+def print_report(report):
+    print(f"{report['players']} players, {report['duration']:.1f}s, "
+          f"{report['requests']} requests, {report['throughput']:.1f} req/s")
+    print(f"{'route':<18}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, stats in report['routes'].items():
+        print(f"{route:<18}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput']:>10.1f}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the game with simulated players and report per-route latency.')
+    parser.add_argument('--players', type=int, default=10, help='number of simulated players')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run')
+    parser.add_argument('--mix', type=parse_mix, default=default_mix, help='route weights, e.g. generate_number=3,gamble=1')
+    parser.add_argument('--think-time', type=float, default=0.0, help='average pause between a player\'s requests, in seconds')
+    parser.add_argument('--url', help='base URL of a running server (default: in-process test client)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = run(args.players, args.mix, args.duration, args.think_time, args.url)
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
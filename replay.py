@@ -0,0 +1,120 @@
+"""Replay a recorded session log through the app.
+
+Start the server with SESSION_LOG_FILE=sessions.jsonl to record traffic, then
+play it back in-process at full speed:
+
+    python replay.py sessions.jsonl
+    python replay.py sessions.jsonl --state-db backup.db   # start from a saved state
+    python replay.py sessions.jsonl --output replayed.jsonl
+
+Every request is sent at its recorded time (the game clock is taken from the
+log, nothing sleeps) with its recorded RNG seed, so a build with unchanged
+game rules reproduces the same responses and player states. Mismatches are
+reported per request, followed by throughput and per-route latency, which
+makes a replay a realistic benchmark too. Replaying the --output of one build
+on another diffs the two builds.
+
+The replay runs on a scratch state database, without bots or server-side
+auto generate ticks. Record from an empty state, or pass the state database
+the recording started from with --state-db.
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Point the app at a scratch database, and keep background activity out of it
+scratch_dir = tempfile.mkdtemp(prefix='replay-')
+atexit.register(shutil.rmtree, scratch_dir, True)
+os.environ['STATE_BACKEND'] = 'sqlite'
+os.environ['STATE_DB_FILE'] = os.path.join(scratch_dir, 'game_state.db')
+os.environ['BOT_COUNT'] = '0'
+os.environ['AUTO_GENERATE_TICK'] = '1e9'
+os.environ.pop('SESSION_LOG_FILE', None)
+
+def read_log(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded session log and diff the outcomes.')
+    parser.add_argument('log', help='session log recorded with SESSION_LOG_FILE')
+    parser.add_argument('--state-db', help='SQLite state database the recording started from')
+    parser.add_argument('--output', help='write the replayed session log here')
+    parser.add_argument('--show', type=int, default=20, help='mismatches to print')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 on any mismatch')
+    args = parser.parse_args()
+
+    entries = read_log(args.log)
+    if args.state_db:
+        shutil.copyfile(args.state_db, os.environ['STATE_DB_FILE'])
+
+    import app as game
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+    clients = {}
+    latencies = {}
+    mismatches = []
+    started = time.perf_counter()
+
+    for number, entry in enumerate(entries, 1):
+        client = clients.get(entry['player'])
+        if client is None:
+            client = clients[entry['player']] = game.app.test_client()
+        with client.session_transaction() as session:
+            session['player_id'] = entry['player']
+            session['admin_logged_in'] = entry.get('admin', False)
+
+        environ = {'game.time': entry['time']}
+        if 'seed' in entry:
+            environ['game.rng_seed'] = entry['seed']
+        headers = {'If-None-Match': entry['if_none_match']} if 'if_none_match' in entry else None
+
+        request_started = time.perf_counter()
+        response = client.open(
+            entry['path'],
+            method=entry['method'],
+            data=entry.get('form'),
+            json=entry.get('json'),
+            headers=headers,
+            environ_overrides=environ
+        )
+        route = entry['path'].split('?')[0]
+        latencies.setdefault(route, []).append(time.perf_counter() - request_started)
+
+        replayed = dict(entry, status=response.status_code, response=game.digest(response.get_data()))
+        replayed.pop('state', None)
+        if 'state' in entry:
+            state = game.state_cache.get(entry['player'])[0]
+            replayed['state'] = game.state_digest(state) if state is not None else None
+        for field in ('status', 'response', 'state'):
+            if entry.get(field) != replayed.get(field):
+                mismatches.append((number, route, field, entry.get(field), replayed.get(field)))
+        if output is not None:
+            output.write(json.dumps(replayed, separators=(',', ':')) + '\n')
+
+    elapsed = time.perf_counter() - started
+    if output is not None:
+        output.close()
+
+    for number, route, field, expected, got in mismatches[:args.show]:
+        print(f'#{number} {route}: {field} was {expected}, replayed {got}')
+    if len(mismatches) > args.show:
+        print(f'... and {len(mismatches) - args.show} more')
+    print(f'{len(entries)} requests replayed in {elapsed:.2f}s ({len(entries) / elapsed:.1f} req/s), '
+          f'{len(mismatches)} mismatches')
+    print(f"{'route':<28}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, times in sorted(latencies.items()):
+        times.sort()
+        print(f"{route:<28}{len(times):>10}{game.percentile(times, 0.50) * 1000:>10.2f}"
+              f"{game.percentile(times, 0.95) * 1000:>10.2f}{game.percentile(times, 0.99) * 1000:>10.2f}")
+
+    if mismatches and args.check:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
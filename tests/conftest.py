@@ -0,0 +1,29 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Run the app on a scratch state database, without bots or auto generate ticks
+scratch_dir = tempfile.mkdtemp(prefix='game-tests-')
+atexit.register(shutil.rmtree, scratch_dir, True)
+os.environ['STATE_BACKEND'] = 'sqlite'
+os.environ['STATE_DB_FILE'] = os.path.join(scratch_dir, 'game_state.db')
+os.environ['BOT_COUNT'] = '0'
+os.environ['AUTO_GENERATE_TICK'] = '1e9'
+for name in ('SESSION_LOG_FILE', 'STATE_SHARDS', 'STATE_SHARED', 'WEB_CONCURRENCY'):
+    os.environ.pop(name, None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as game
+
+@pytest.fixture
+def client():
+    return game.app.test_client()
+
+def session_player(client):
+    with client.session_transaction() as session:
+        return session['player_id']
@@ -0,0 +1,23 @@
+from conftest import game
+
+def test_masks_saved_under_another_achievement_order_are_rebuilt():
+    # A save from a build that listed the achievements in reverse order
+    old_bits = {achievement_id: 1 << i for i, achievement_id in enumerate(reversed(list(game.achievements)))}
+    roll_achievements = [achievement_id for threshold, achievement_id in game.achievement_thresholds['total_rolls']]
+    unlocked = roll_achievements[:2]
+    game_data = game.default_game_data()
+    game_data['coins'] = 0
+    game_data['stats']['total_rolls'] = game.achievements[roll_achievements[2]]['threshold']
+    game_data['achievements'] = {
+        'unlocked': unlocked,
+        'index': 'older-build',
+        'mask': old_bits[unlocked[0]] | old_bits[unlocked[1]],
+        'next': {'total_rolls': game.achievements[roll_achievements[2]]['threshold']}
+    }
+    game.state_store.put('achievements-reordered', game_data)
+
+    game_data = game.load_game_data('achievements-reordered')
+    coins = game_data['coins']
+    assert game.check_achievements(game_data) == [roll_achievements[2]]
+    assert game_data['coins'] == coins + game.achievements[roll_achievements[2]]['reward']
+    assert game_data['achievements']['unlocked'] == roll_achievements[:3]
@@ -0,0 +1,47 @@
+import time
+
+from conftest import game, session_player
+
+def give_auto_generate(player_id, seconds_ago):
+    # A player who switched auto generate on seconds_ago and hasn't been ticked since
+    game_data = game.load_game_data(player_id)
+    game_data['game_passes']['auto_generate'] = True
+    game_data['auto_generate_active'] = True
+    game_data['auto_generate_last_tick'] = time.time() - seconds_ago
+    game.save_game_data(game_data, player_id)
+
+def test_startup_scan_leaves_the_cache_alone():
+    game_data = game.default_game_data()
+    game_data['game_passes']['auto_generate'] = True
+    game_data['auto_generate_active'] = True
+    game.state_store.put('scanned-player', game_data)
+    game.auto_generate_players.discard('scanned-player')
+
+    game.scan_saved_players()
+    assert 'scanned-player' in game.auto_generate_players
+    assert game.leaderboard_index.rank('coins', 'scanned-player') is not None
+    assert 'scanned-player' not in game.state_cache.entries
+    game.auto_generate_players.discard('scanned-player')
+
+def test_tick_catches_up_on_the_time_since_the_last_one():
+    give_auto_generate('catching-up', 10)
+    game.run_player_transaction('catching-up', game.auto_generate_tick, 'catching-up')
+    game_data = game.load_game_data('catching-up')
+    rolls = int(10 * game.AUTO_GENERATE_RATE)
+    assert game_data['stats']['total_rolls'] == rolls
+    assert game_data['auto_generate_results']['rolls'] == rolls
+
+    # Nothing more is owed until time passes
+    game.run_player_transaction('catching-up', game.auto_generate_tick, 'catching-up')
+    assert game.load_game_data('catching-up')['stats']['total_rolls'] == rolls
+
+def test_results_are_handed_over_once(client):
+    assert client.post('/get_auto_generate_results').get_json()['results'] is None
+    player_id = session_player(client)
+    give_auto_generate(player_id, 5)
+    game.run_player_transaction(player_id, game.auto_generate_tick, player_id)
+
+    fetched = client.post('/get_auto_generate_results').get_json()
+    assert fetched['results']['rolls'] == int(5 * game.AUTO_GENERATE_RATE)
+    assert fetched['stats']['total_rolls'] == fetched['results']['rolls']
+    assert client.post('/get_auto_generate_results').get_json()['results'] is None
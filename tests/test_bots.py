@@ -0,0 +1,27 @@
+import math
+
+import numpy as np
+
+from conftest import game
+
+def test_bot_ticks_keep_the_population_shape():
+    game.rng.reseed(game.derive_rng_key('test:bots'), 0)
+    count = 5000
+    bots = game.BotPopulation(game.make_bot_names(count))
+    assert len(set(bots.names)) == count
+
+    for _ in range(20):
+        best_before, rolls_before = bots.best_number.copy(), bots.total_rolls.copy()
+        changed = bots.tick(game.BOT_TICK)
+        for array in (bots.coins, bots.best_number, bots.total_rolls, bots.last_active, bots.active):
+            assert array.shape == (count,)
+        assert bots.coins.dtype == bots.best_number.dtype == bots.total_rolls.dtype == np.int64
+        assert (bots.coins >= 0).all()
+        assert (bots.best_number >= best_before).all() and (bots.total_rolls >= rolls_before).all()
+        assert len(set(changed.tolist())) == len(changed) and (0 <= changed).all() and (changed < count).all()
+
+    # Each bot acts on average every BOT_ACTION_INTERVAL seconds, a third of
+    # the time generating
+    act_chance = 1 - math.exp(-game.BOT_TICK / game.BOT_ACTION_INTERVAL)
+    expected_rolls = 20 * count * act_chance / len(game.BOT_ACTIVITIES)
+    assert abs(bots.total_rolls.sum() - expected_rolls) < 5 * math.sqrt(expected_rolls)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from conftest import game
+
+@pytest.fixture
+def rich_client(client):
+    client.post('/buy_coins', data={'amount': 250000})
+    return client
+
+@pytest.mark.parametrize('target_range', ['1-99999999999999999999999', '0-100', '-5-100', '500-100', '1-1000001', 'abc'])
+def test_gamble_rejects_out_of_range_bounds(rich_client, target_range):
+    response = rich_client.post('/gamble', data={'bet_amount': 10, 'target_range': target_range})
+    assert response.status_code == 200
+    assert not response.get_json()['success']
+
+def test_gamble_batch_rejects_out_of_range_bounds(rich_client):
+    bets = [{'bet_amount': 10, 'target_range': '1-1000'}, {'bet_amount': 10, 'target_range': '1-99999999999999999999999'}]
+    response = rich_client.post('/gamble_batch', json={'bets': bets})
+    assert response.status_code == 200
+    assert not response.get_json()['success']
+
+def test_gamble_accepts_the_full_range(rich_client):
+    response = rich_client.post('/gamble', data={'bet_amount': 10, 'target_range': '1-1000000'})
+    assert response.get_json()['success']
+
+def test_gamble_payouts_are_fair():
+    number_limit = 1000000
+    lows = np.array([1, 1, 1000, 100000, 500000, 900000, 999000, 999990])
+    highs = np.array([1000000, 500000, 20000, 200000, 600000, 1000000, 999500, 1000000])
+    probability, payout = game.gamble_odds(number_limit, lows, highs)
+    uncapped = payout < game.MAX_GAMBLE_PAYOUT
+    assert uncapped.sum() >= 6
+    assert payout[uncapped] * probability[uncapped] == pytest.approx(np.ones(uncapped.sum()))
+    # Long shots are capped, so they pay back less than they cost on average
+    assert (payout[~uncapped] * probability[~uncapped] < 1).all()
+
+    # And the expected return holds up against actual rolls
+    game.rng.reseed(game.derive_rng_key('test:gamble'), 0)
+    rolls = game.roll_distribution(number_limit).sample_many(400000)
+    for low, high, multiplier, p in zip(lows[uncapped], highs[uncapped], payout[uncapped], probability[uncapped]):
+        hit_rate = np.mean((rolls >= low) & (rolls <= high))
+        assert hit_rate * multiplier == pytest.approx(1, abs=5 * multiplier * np.sqrt(p * (1 - p) / len(rolls)))
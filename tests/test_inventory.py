@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from conftest import game
+
+def legacy_item(rarity, item):
+    # An inventory entry from before counts: a copy of the item per pull
+    return dict(item, rarity=rarity, color=game.item_rarities[rarity]['color'])
+
+def test_legacy_list_inventories_migrate_to_counts_losslessly():
+    common, rare = game.items_by_rarity['common'], game.items_by_rarity['rare']
+    game_data = game.default_game_data()
+    game_data['inventory'] = {
+        'common': [legacy_item('common', common[0])] * 3 + [legacy_item('common', common[1])],
+        'rare': [legacy_item('rare', rare[0])] * 2
+    }
+    game.state_store.put('legacy-inventory', game_data)
+
+    inventory = game.load_game_data('legacy-inventory')['inventory']
+    assert inventory['common'] == {common[0]['name']: 3, common[1]['name']: 1}
+    assert inventory['rare'] == {rare[0]['name']: 2}
+    assert set(inventory) == set(game.item_rarities)
+    assert all(inventory[rarity] == {} for rarity in game.item_rarities if rarity not in ('common', 'rare'))
+
+    # The counts are what gets saved, and they read back the same
+    game.save_game_data(game.load_game_data('legacy-inventory'), 'legacy-inventory')
+    game.state_cache.flush()
+    game.state_cache.invalidate('legacy-inventory')
+    assert game.load_game_data('legacy-inventory')['inventory'] == inventory
+
+@pytest.mark.parametrize('draw', ['scalar', 'vectorized'])
+def test_item_sampler_follows_the_rarity_weights(draw):
+    game.rng.reseed(game.derive_rng_key(f'test:items:{draw}'), 0)
+    count = 200000
+    if draw == 'scalar':
+        outcomes = np.array([game.item_sampler.sample() for _ in range(count)])
+    else:
+        outcomes = game.item_sampler.sample_many(count)
+    frequencies = np.bincount(outcomes, minlength=len(game.item_outcomes)) / count
+
+    total_chance = sum(rarity['chance'] for rarity in game.item_rarities.values())
+    for rarity, info in game.item_rarities.items():
+        expected = info['chance'] / total_chance
+        observed = sum(frequencies[i] for i, (outcome_rarity, item) in enumerate(game.item_outcomes) if outcome_rarity == rarity)
+        assert observed == pytest.approx(expected, abs=5 * np.sqrt(expected * (1 - expected) / count))
+        # Items within a rarity are equally likely
+        per_item = [frequencies[i] for i, (outcome_rarity, item) in enumerate(game.item_outcomes) if outcome_rarity == rarity]
+        share = expected / len(per_item)
+        assert all(f == pytest.approx(share, abs=5 * np.sqrt(share / count)) for f in per_item)
@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+
+from conftest import game
+
+def open_store(tmp_path):
+    return game.JournalStateStore(str(tmp_path), 10 ** 9, 3600)
+
+def journal_records(store):
+    records = []
+    for path in store.segments():
+        with open(path, encoding='utf-8') as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+def test_journal_records_hold_only_changed_fields(tmp_path):
+    store = open_store(tmp_path)
+    state = game.default_game_data()
+    store.put('player', state)
+    state['coins'] += 5
+    state['stats']['total_rolls'] += 1
+    del state['auras_collected']
+    store.put('player', state)
+
+    first, second = journal_records(store)
+    assert set(first['set']) == set(game.default_game_data())
+    assert second['set'] == {'coins': state['coins'], 'stats': state['stats']}
+    assert second['unset'] == ['auras_collected']
+    assert store.get('player') == state
+
+def test_journal_recovers_from_changed_fields(tmp_path):
+    store = open_store(tmp_path)
+    state = game.default_game_data()
+    for coins in range(5):
+        state['coins'] = coins
+        store.put('player', state)
+    store.put('other', {'coins': 1})
+    assert open_store(tmp_path).get('player') == state
+
+def test_journal_recovers_after_compaction(tmp_path):
+    store = open_store(tmp_path)
+    state = game.default_game_data()
+    store.put('player', state)
+    store.compact()
+    state['coins'] = 42
+    store.put('player', state)
+    recovered = open_store(tmp_path)
+    assert recovered.get('player') == state
+    assert recovered.player_ids() == ['player']
+
+def test_journal_reads_full_state_records(tmp_path):
+    state = game.default_game_data()
+    record = {'seq': 1, 'ts': 0, 'player': 'old', 'event': None, 'state': state}
+    with open(os.path.join(tmp_path, 'journal-0000000000000001.log'), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+    store = open_store(tmp_path)
+    assert store.get('old') == state
+    state['coins'] = 7
+    store.put('old', state)
+    assert open_store(tmp_path).get('old') == state
+
+def test_failed_commit_fails_only_its_batch(tmp_path, monkeypatch):
+    store = open_store(tmp_path)
+    state = game.default_game_data()
+    store.put('player', state)
+
+    fsync = os.fsync
+    def failing_fsync(fd):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(game.os, 'fsync', failing_fsync)
+    state['coins'] = 1
+    with pytest.raises(OSError):
+        store.put('player', state)
+    with pytest.raises(OSError):
+        store.put('newcomer', {'coins': 3})
+    assert store.get('player')['coins'] == game.default_game_data()['coins']
+    assert store.get('newcomer') is None
+
+    monkeypatch.setattr(game.os, 'fsync', fsync)
+    state['coins'] = 2
+    store.put('player', state)
+    assert [record['seq'] for record in journal_records(store)] == [1, 4]
+    recovered = open_store(tmp_path)
+    assert recovered.get('player') == state
+    assert recovered.player_ids() == ['player']
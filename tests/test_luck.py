@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+from conftest import game, session_player
+
+def test_luck_follows_aura_expiry_and_pass_purchases(client):
+    client.get('/get_inventory')
+    player_id = session_player(client)
+    game_data = game.load_game_data(player_id)
+    base = game.get_luck(game_data)[0]
+
+    now = time.time()
+    game.activate_aura(game_data, 'lucky_aura', now=now)
+    assert game.get_luck(game_data)[0] == pytest.approx(base * game.auras['lucky_aura']['multiplier'])
+    assert game.expire_auras(game_data, now=now + game.auras['lucky_aura']['duration_seconds'])
+    assert game.get_luck(game_data)[0] == pytest.approx(base)
+    game.save_game_data(game_data, player_id)
+
+    assert client.post('/buy_game_pass', data={'pass_id': 'double_luck'}).get_json()['success']
+    assert game.get_luck(game.load_game_data(player_id))[0] == pytest.approx(base * 2)
+
+def test_auras_expire_in_expiry_order():
+    game_data = game.default_game_data()
+    start = time.time()
+    game.activate_aura(game_data, 'celestial_aura', now=start)
+    game.activate_aura(game_data, 'rainbow_aura', now=start + 5)
+    game.activate_aura(game_data, 'lucky_aura', now=start + 10)
+    assert [aura['id'] for aura in game_data['active_auras']] == ['lucky_aura', 'rainbow_aura', 'celestial_aura']
+
+    def active_after(seconds):
+        game.expire_auras(game_data, now=start + seconds)
+        return [aura['id'] for aura in game_data['active_auras']]
+
+    assert active_after(1800) == ['lucky_aura', 'rainbow_aura', 'celestial_aura']
+    assert active_after(1810) == ['rainbow_aura', 'celestial_aura']
+    assert active_after(3605) == ['celestial_aura']
+    assert game.get_luck(game_data)[0] == pytest.approx(game.auras['celestial_aura']['multiplier'])
+    assert active_after(7200) == []
@@ -0,0 +1,48 @@
+from conftest import game, session_player
+
+def test_unversioned_market_records_are_converted(client):
+    item_id = min(game.game_items, key=lambda item_id: game.game_items[item_id]['base_price'])
+    supplies = {item_id: item['initial_supply'] - 3 for item_id, item in game.game_items.items()}
+    game.state_cache.put(game.MARKET_STATE_ID, supplies, 'market')
+    game.market.info_cache.clear()
+    try:
+        state, version = game.market.state()
+        assert state['version'] == 0
+        assert state['supply'] == supplies
+
+        info = client.get('/get_market_info').get_json()
+        assert info['market_info'][item_id]['supply'] == supplies[item_id]
+
+        client.post('/buy_coins', data={'amount': 250000})
+        game_data = game.load_game_data(session_player(client))
+        game_data['coins'] = 10 ** 9
+        game.save_game_data(game_data, session_player(client))
+        response = client.post('/buy_item', data={'item_id': item_id, 'quantity': 1}).get_json()
+        assert response['success']
+        game.state_cache.flush()
+        saved = game.state_store.get(game.MARKET_STATE_ID)
+        assert saved['version'] == 1
+        assert saved['supply'][item_id] == supplies[item_id] - 1
+    finally:
+        game.state_cache.put(game.MARKET_STATE_ID, {'version': 0, 'supply': {}}, 'market')
+        game.market.info_cache.clear()
+
+def test_conditional_market_info_is_not_modified_until_a_trade(client):
+    item_id = min(game.game_items, key=lambda item_id: game.game_items[item_id]['base_price'])
+    first = client.get('/get_market_info')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert client.get('/get_market_info', headers={'If-None-Match': etag}).status_code == 304
+
+    # Another player's trade moves the market for everyone
+    trader = game.app.test_client()
+    trader.post('/buy_coins', data={'amount': 250000})
+    game_data = game.load_game_data(session_player(trader))
+    game_data['coins'] = 10 ** 9
+    game.save_game_data(game_data, session_player(trader))
+    assert trader.post('/buy_item', data={'item_id': item_id, 'quantity': 1}).get_json()['success']
+
+    after = client.get('/get_market_info', headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != etag
+    assert after.get_json()['market_info'][item_id]['supply'] == first.get_json()['market_info'][item_id]['supply'] - 1
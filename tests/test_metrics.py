@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from conftest import game
+
+def counter_value(name, **labels):
+    counters, histograms = game.metrics.collect()
+    return counters.get((name, tuple(sorted(labels.items()))), 0)
+
+def test_finished_threads_shards_are_retired():
+    before = counter_value('rolls_total', source='test')
+    for _ in range(50):
+        thread = threading.Thread(target=game.metrics.inc, args=('rolls_total',), kwargs={'source': 'test'})
+        thread.start()
+        thread.join()
+    assert len(game.metrics.shards) < 10
+    assert counter_value('rolls_total', source='test') == before + 50
+    assert len(game.metrics.shards) <= threading.active_count()
+
+def test_retried_transactions_record_metrics_once():
+    attempts = []
+
+    def handler():
+        game.metrics.inc('rolls_total', source='retried')
+        game.metrics.observe('state_load_bytes', 100)
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise game.StateConflict('retried-player')
+
+    rolls = counter_value('rolls_total', source='retried')
+    conflicts = counter_value('state_conflicts_total')
+    game.run_player_transaction('retried-player', handler)
+    assert len(attempts) == 2
+    assert counter_value('rolls_total', source='retried') == rolls + 1
+    assert counter_value('state_conflicts_total') == conflicts + 1
+
+def test_metrics_render_after_requests(client):
+    client.post('/generate_number')
+    admin = game.app.test_client()
+    with admin.session_transaction() as session:
+        session['admin_logged_in'] = True
+    text = admin.get('/admin/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="generate_number",status="200"}' in text
+
+@pytest.mark.parametrize('query', ['interval_ms=0', 'interval_ms=-5', 'interval_ms=0.01', 'interval_ms=nan', 'seconds=0', 'seconds=600'])
+def test_profile_rejects_bad_parameters(query):
+    admin = game.app.test_client()
+    with admin.session_transaction() as session:
+        session['admin_logged_in'] = True
+    assert admin.get(f'/admin/profile?{query}').status_code == 400
+
+def test_profile_samples_threads():
+    admin = game.app.test_client()
+    with admin.session_transaction() as session:
+        session['admin_logged_in'] = True
+    result = admin.get('/admin/profile?seconds=0.05&interval_ms=1').get_json()
+    assert result['success'] and result['samples'] > 0
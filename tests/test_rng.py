@@ -0,0 +1,52 @@
+from conftest import game, session_player
+
+def test_consecutive_loads_draw_disjoint_streams():
+    draws = []
+    for _ in range(3):
+        game_data = game.load_game_data('rng-player')
+        draws.append(set(game.rng.generator.random(4096).tolist()))
+        game.save_game_data(game_data, 'rng-player')
+    assert not draws[0] & draws[1]
+    assert not draws[1] & draws[2]
+
+def test_same_seed_replays_the_same_draws():
+    game.rng.reseed(game.derive_rng_key('player:replayed'), 7)
+    first = game.rng.generator.random(100).tolist()
+    game.rng.reseed(game.derive_rng_key('player:replayed'), 7)
+    assert game.rng.generator.random(100).tolist() == first
+
+def test_consecutive_requests_roll_differently(client):
+    results = []
+    for _ in range(3):
+        response = client.post('/generate_number_batch', data={'n': 2000})
+        assert response.status_code == 200
+        results.append(response.get_json())
+    game_data = game.load_game_data(session_player(client))
+    assert game_data['stats']['total_rolls'] == 6000
+    assert len({result['best_number'] for result in results}) > 1
+
+def rng_draws_after_load(player_id):
+    game_data = game.load_game_data(player_id)
+    return game_data['rng_sequence'], game.rng.generator.random(64).tolist()
+
+def test_prestige_keeps_the_players_place_in_their_stream(client):
+    for _ in range(3):
+        client.post('/generate_number_batch', data={'n': 10})
+    player_id = session_player(client)
+    sequence_before, draws_before = rng_draws_after_load(player_id)
+    assert client.post('/prestige').get_json()['success']
+    sequence_after, draws_after = rng_draws_after_load(player_id)
+    assert sequence_after > sequence_before
+    assert draws_after != draws_before
+
+def test_admin_reset_keeps_the_players_place_in_their_stream(client):
+    for _ in range(3):
+        client.post('/generate')
+    player_id = session_player(client)
+    sequence_before, _ = rng_draws_after_load(player_id)
+    admin = game.app.test_client()
+    with admin.session_transaction() as session:
+        session['admin_logged_in'] = True
+    admin.post('/admin/reset_all', data={'player_id': player_id})
+    sequence_after, _ = rng_draws_after_load(player_id)
+    assert sequence_after > sequence_before
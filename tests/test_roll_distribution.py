@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from conftest import game
+
+@pytest.fixture
+def distribution():
+    return game.roll_distribution(1000000)
+
+def test_range_probability_clamps_huge_bounds(distribution):
+    assert distribution.range_probability(1, 10 ** 30) == pytest.approx(1)
+    assert distribution.range_probability(-10 ** 30, 10 ** 30) == pytest.approx(1)
+    assert distribution.range_probability(10 ** 30, 10 ** 31) == 0
+
+def test_range_probability_matches_for_scalars_and_arrays(distribution):
+    lows = np.array([1, 1000, 500000, 999999], dtype=np.int64)
+    highs = np.array([10, 2000, 2 ** 62, np.iinfo(np.int64).max], dtype=np.int64)
+    probabilities = distribution.range_probability(lows, highs)
+    for low, high, probability in zip(lows.tolist(), highs.tolist(), probabilities):
+        assert distribution.range_probability(low, high) == pytest.approx(probability)
+    assert probabilities[3] == pytest.approx(distribution.tail(999999))
+
+def test_range_probability_matches_sampled_rolls(distribution):
+    game.rng.reseed(game.derive_rng_key('test:distribution'), 0)
+    rolls = distribution.sample_many(200000)
+    empirical = np.mean((rolls >= 100000) & (rolls <= 500000))
+    assert distribution.range_probability(100000, 500000) == pytest.approx(empirical, abs=0.005)
+
+def test_closed_form_batches_match_exact_sampling():
+    # Total, best and target hits of 2000-roll batches, drawn roll by roll and
+    # from the closed form, should agree in mean and spread
+    number_limit, count, trials = 1000000, 2000, 1000
+    thresholds = list(game.default_target_numbers()[target] for target in ('easy', 'medium', 'hard'))
+    distribution = game.roll_distribution(number_limit)
+    game.rng.reseed(game.derive_rng_key('test:closed-form'), 0)
+    exact = []
+    for _ in range(trials):
+        rolls = distribution.sample_many(count)
+        exact.append([rolls.sum(), rolls.max()] + [np.count_nonzero(rolls >= t) for t in thresholds])
+    closed = [
+        [total, best] + hits
+        for total, best, hits in (game.summarize_rolls_closed_form(number_limit, count, thresholds) for _ in range(trials))
+    ]
+    exact, closed = np.array(exact, dtype=float), np.array(closed, dtype=float)
+    for column in range(exact.shape[1]):
+        spread = exact[:, column].std()
+        standard_error = spread * np.sqrt(2 / trials)
+        assert closed[:, column].mean() == pytest.approx(exact[:, column].mean(), abs=5 * standard_error)
+        assert closed[:, column].std() == pytest.approx(spread, rel=0.25)
@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from conftest import game, session_player
+
+def test_fresh_session_can_generate(client):
+    response = client.post('/generate_number')
+    assert response.status_code == 200
+    assert response.get_json()['success']
+    game_data = game.load_game_data(session_player(client))
+    assert game_data['stats']['total_rolls'] >= 1
+
+def test_fresh_session_batch_pays_target_rewards(client):
+    response = client.post('/generate_number_batch', data={'n': 1000})
+    assert response.status_code == 200
+    assert response.get_json()['target_hits']
+
+def test_saves_without_target_numbers_are_backfilled():
+    game_data = game.default_game_data()
+    del game_data['target_numbers']
+    game.state_store.put('old-save', game_data)
+    game.state_cache.invalidate('old-save')
+    assert game.load_game_data('old-save')['target_numbers'] == game.default_target_numbers()
+
+def test_sessions_get_separate_players():
+    first, second = game.app.test_client(), game.app.test_client()
+    first.post('/buy_coins', data={'amount': 100000})
+    second.post('/generate')
+    assert session_player(first) != session_player(second)
+    assert game.load_game_data(session_player(first))['coins'] == 101000
+    assert game.load_game_data(session_player(second))['coins'] < 1000
+
+def test_anonymous_leaderboard_views_are_not_ranked():
+    before = len(game.leaderboard_index)
+    for _ in range(5):
+        game.app.test_client().get('/leaderboard')
+        game.app.test_client().get('/get_leaderboard')
+    assert len(game.leaderboard_index) == before
+
+def test_saved_players_are_ranked(client):
+    client.post('/buy_coins', data={'amount': 250000})
+    leaderboard = client.get('/get_leaderboard').get_json()
+    assert leaderboard['my_rank'] is not None
+
+def test_leaderboard_sync_picks_up_other_workers_saves():
+    # Saves another worker made straight to the shared store
+    game_data = game.default_game_data()
+    game_data['coins'] = 10 ** 15
+    game.state_store.put('other-worker-player', game_data)
+    game.leaderboard_index.sync(game.state_store)
+    assert game.leaderboard_index.rank('coins', 'other-worker-player') == 1
+
+    game_data['coins'] = 0
+    game.state_store.put('other-worker-player', game_data)
+    game.leaderboard_index.sync(game.state_store)
+    assert game.leaderboard_index.rank('coins', 'other-worker-player') > 1
+
+    game.state_store.delete('other-worker-player')
+    game.leaderboard_index.sync(game.state_store)
+    assert game.leaderboard_index.rank('coins', 'other-worker-player') is None
+
+def admin_client():
+    client = game.app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+    return client
+
+def test_admin_can_act_on_another_player(client):
+    client.post('/buy_coins', data={'amount': 100000})
+    admin_client().post('/admin/add_coins', data={'amount': 7, 'player_id': session_player(client)})
+    assert game.load_game_data(session_player(client))['coins'] == 101007
+
+def test_admin_cannot_target_reserved_records():
+    market_before = game.state_store.get(game.MARKET_STATE_ID)
+    response = admin_client().post('/admin/add_coins', data={'amount': 7, 'player_id': game.MARKET_STATE_ID})
+    assert response.status_code == 400
+    assert game.state_store.get(game.MARKET_STATE_ID) == market_before
+
+def test_loading_waits_for_the_players_transaction():
+    game.save_game_data(game.default_game_data(), 'locked-player')
+    loaded = threading.Event()
+    loader = threading.Thread(target=lambda: (game.load_game_data('locked-player'), loaded.set()))
+    with game.player_lock('locked-player'):
+        loader.start()
+        assert not loaded.wait(0.2)
+    assert loaded.wait(5)
+    loader.join()
+
+def test_read_routes_wait_for_the_players_transaction(client):
+    client.get('/get_inventory')
+    player_id = session_player(client)
+    served = threading.Event()
+    reader = threading.Thread(target=lambda: (client.get('/get_inventory'), served.set()))
+    with game.player_lock(player_id):
+        reader.start()
+        assert not served.wait(0.2)
+    assert served.wait(5)
+    reader.join()
+
+@pytest.mark.parametrize('method, path, data', [
+    ('POST', '/buy_pack', {'pack_id': 'basic'}),
+    ('POST', '/buy_aura', {'aura_id': 'lucky'}),
+    ('POST', '/buy_game_pass', {'pass_id': 'triple_generate'}),
+    ('POST', '/toggle_auto_generate', {}),
+    ('POST', '/get_auto_generate_results', {}),
+    ('POST', '/increase_limit', {}),
+    ('POST', '/prestige', {}),
+    ('POST', '/buy_prestige_upgrade', {'upgrade_id': 'luck_boost'}),
+    ('GET', '/get_prestige_info', {}),
+    ('POST', '/reroll', {}),
+    ('POST', '/check_achievements', {}),
+    ('GET', '/get_achievements', {}),
+    ('GET', '/get_daily_reward_status', {}),
+    ('POST', '/claim_daily_reward', {}),
+    ('GET', '/get_market_info', {}),
+    ('POST', '/buy_item', {'item_id': 'boot', 'quantity': 1}),
+    ('POST', '/generate', {}),
+    ('GET', '/get_inventory', {}),
+    ('POST', '/trade_item', {'item_name': 'nothing', 'rarity': 'common', 'amount': 1}),
+    ('GET', '/get_leaderboard', {}),
+    ('POST', '/gamble', {'bet_amount': 10, 'target_range': '1-1000'}),
+])
+def test_fresh_session_routes_answer(client, method, path, data):
+    response = client.open(path, method=method, data=data)
+    assert response.status_code == 200
+    assert response.is_json
@@ -0,0 +1,53 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+from conftest import game
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def recorded_entries(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_credentials_stay_out_of_session_logs(client, tmp_path, monkeypatch):
+    log = tmp_path / 'sessions.jsonl'
+    recorder = game.SessionRecorder(str(log))
+    monkeypatch.setattr(game, 'session_recorder', recorder)
+
+    client.post('/admin/login', data={'username': 'admin', 'password': 'hunter2'})
+    client.post('/buy_coins', data={'amount': 100000, 'password': 'hunter2', 'token': 'tok-s3cret'})
+    client.post('/gamble_batch', json={'bets': [], 'token': 'tok-s3cret'})
+    recorder.file.close()
+
+    text = log.read_text(encoding='utf-8')
+    assert 'hunter2' not in text and 'tok-s3cret' not in text
+    entries = recorded_entries(log)
+    assert [entry['path'] for entry in entries] == ['/buy_coins', '/gamble_batch']
+    assert entries[0]['form'] == {'amount': '100000', 'password': game.REDACTED, 'token': game.REDACTED}
+    assert entries[1]['json']['token'] == game.REDACTED
+
+def test_recorded_session_replays_without_mismatches(client, tmp_path, monkeypatch):
+    # Replay starts from a copy of the state the recording started from
+    game.state_cache.flush()
+    start = tmp_path / 'start.db'
+    with sqlite3.connect(game.STATE_DB_FILE) as source, sqlite3.connect(start) as target:
+        source.backup(target)
+    log = tmp_path / 'sessions.jsonl'
+    recorder = game.SessionRecorder(str(log))
+    monkeypatch.setattr(game, 'session_recorder', recorder)
+
+    client.post('/generate_number')
+    etag = client.get('/get_market_info').headers['ETag']
+    assert client.get('/get_market_info', headers={'If-None-Match': etag}).status_code == 304
+    recorder.file.close()
+
+    assert [entry['status'] for entry in recorded_entries(log)] == [200, 200, 304]
+    replay = subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, 'replay.py'), str(log), '--state-db', str(start), '--check'],
+        capture_output=True, text=True
+    )
+    assert replay.returncode == 0, replay.stdout + replay.stderr
+    assert '0 mismatches' in replay.stdout
@@ -0,0 +1,98 @@
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import game
+
+def shard_paths(tmp_path, count):
+    return [str(tmp_path / 'state.db')] + [str(tmp_path / f'state-{i}.db') for i in range(1, count)]
+
+def test_sharded_store_moves_a_fraction_of_players_when_growing(tmp_path):
+    store = game.ShardedStateStore(shard_paths(tmp_path, 2), 64)
+    for i in range(300):
+        store.put(f'player{i}', {'coins': i})
+    before = {f'player{i}': store.shard_index(f'player{i}') for i in range(300)}
+
+    store = game.ShardedStateStore(shard_paths(tmp_path, 3), 64)
+    moved = [player_id for player_id in before if store.shard_index(player_id) != before[player_id]]
+    assert 50 < len(moved) < 150
+    assert all(store.shard_index(player_id) == 2 for player_id in moved)
+    assert sorted(store.player_ids()) == sorted(before)
+    for index, shard in enumerate(store.shards):
+        assert all(store.shard_index(player_id) == index for player_id in shard.player_ids())
+    assert all(store.get(f'player{i}') == {'coins': i} for i in range(300))
+
+def test_concurrent_rebalances_keep_every_player_once(tmp_path):
+    store = game.ShardedStateStore(shard_paths(tmp_path, 2), 64)
+    for i in range(300):
+        store.put(f'player{i}', {'coins': i})
+
+    stores = []
+    threads = [
+        threading.Thread(target=lambda: stores.append(game.ShardedStateStore(shard_paths(tmp_path, 4), 64)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(stores) == 4
+    assert sorted(stores[0].player_ids()) == sorted(f'player{i}' for i in range(300))
+    assert all(stores[0].get(f'player{i}') == {'coins': i} for i in range(300))
+
+class FlakyStore(game.SQLiteStateStore):
+    # A store whose writes can be made to fail, like a full disk
+    failing = False
+
+    def put_many(self, items):
+        if self.failing:
+            raise sqlite3.OperationalError('database or disk is full')
+        super().put_many(items)
+
+def test_failed_flush_keeps_states_dirty(tmp_path):
+    store = FlakyStore(str(tmp_path / 'state.db'))
+    cache = game.StateCache(store, 10 ** 6, 0)
+    cache.flush_interval = 60  # write-behind, flushed by hand
+    cache.put('player', {'coins': 5})
+
+    store.failing = True
+    with pytest.raises(sqlite3.OperationalError):
+        cache.flush()
+    assert store.get('player') is None
+
+    store.failing = False
+    assert cache.flush() == 1
+    assert store.get('player') == {'coins': 5}
+    assert cache.flush() == 0
+
+def test_failed_eviction_keeps_unsaved_states_cached(tmp_path):
+    store = FlakyStore(str(tmp_path / 'state.db'))
+    cache = game.StateCache(store, 10 ** 6, 0)
+    cache.flush_interval = 60
+    cache.put('first', {'coins': 1})
+
+    store.failing = True
+    cache.max_bytes = 1
+    cache.put('second', {'coins': 2})
+    assert cache.get('first')[0] == {'coins': 1}
+
+    store.failing = False
+    cache.put('third', {'coins': 3})
+    assert store.get('first') == {'coins': 1}
+    assert store.get('second') == {'coins': 2}
+    assert list(cache.entries) == ['third']
+
+def test_failed_write_through_leaves_the_cache_at_the_stored_state(tmp_path):
+    store = FlakyStore(str(tmp_path / 'state.db'))
+    cache = game.StateCache(store, 10 ** 6, 0)
+    state = {'coins': 1}
+    cache.put('player', state)
+
+    store.failing = True
+    state['coins'] = 2
+    with pytest.raises(sqlite3.OperationalError):
+        cache.put('player', state)
+    store.failing = False
+    assert cache.get('player')[0] == {'coins': 1}
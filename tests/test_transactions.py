@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from conftest import game, session_player
+
+@pytest.fixture
+def shared_cache(tmp_path, monkeypatch):
+    # A worker in shared mode: write-through, compare-and-swap saves
+    store = game.SQLiteStateStore(str(tmp_path / 'shared.db'))
+    cache = game.StateCache(store, 10 ** 6, 0, shared=True)
+    monkeypatch.setattr(game, 'state_cache', cache)
+    return cache
+
+def test_stale_save_raises_conflict(shared_cache):
+    other_worker = game.StateCache(shared_cache.store, 10 ** 6, 0, shared=True)
+    shared_cache.put('player', {'coins': 1}, expected_version=0)
+    state, version = shared_cache.get('player')
+    other_state, other_version = other_worker.get('player')
+    other_worker.put('player', {'coins': 2}, expected_version=other_version)
+    with pytest.raises(game.StateConflict):
+        shared_cache.put('player', {'coins': 3}, expected_version=version)
+    assert shared_cache.store.get('player') == {'coins': 2}
+
+def test_transaction_is_retried_on_fresh_state(shared_cache):
+    game.save_game_data(game.default_game_data(), 'retried')
+    attempts = []
+
+    def add_coin():
+        game_data = game.load_game_data('retried')
+        if not attempts:
+            # Another worker saves the player while this attempt is running
+            other = dict(game_data, coins=5000)
+            shared_cache.store.put('retried', other)
+        attempts.append(game_data['coins'])
+        game_data['coins'] += 1
+        game.save_game_data(game_data, 'retried')
+
+    game.run_player_transaction('retried', add_coin)
+    assert attempts == [1000, 5000]
+    assert shared_cache.store.get('retried')['coins'] == 5001
+
+def test_concurrent_requests_for_one_player_lose_no_updates(client):
+    client.post('/buy_coins', data={'amount': 100000})
+    with client.session_transaction() as session:
+        player_id = session['player_id']
+
+    def buy():
+        worker = game.app.test_client()
+        with worker.session_transaction() as session:
+            session['player_id'] = player_id
+        for _ in range(10):
+            assert worker.post('/buy_coins', data={'amount': 100000}).get_json()['success']
+
+    threads = [threading.Thread(target=buy) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert game.load_game_data(session_player(client))['coins'] == 1000 + 81 * 100000